@@ -0,0 +1,94 @@
+"""
+Response compression: CPU cost and bytes on the wire.
+
+    $ python benchmarks/compression.py --rows 10000 --requests 200
+
+Seeds --rows characters into a temporary SQLite file and takes the body of
+`GET /characters`. First every codec/level is timed on that body, then the
+route itself is timed through the Flask test client, served from the catalog
+cache (gzip compressed once and stored with the entry) and with the cache
+disabled (rows read and compressed on every request). brotli rows only
+show up when the `brotli` package is installed.
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+def time_codec(compress, body, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        data = compress(body)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return data, best
+
+def time_requests(client, headers, count):
+    timings = []
+    size = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get("/characters", headers=headers)
+        size = len(response.get_data())
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "req_s": round(count / (sum(timings) / 1000), 1),
+        "bytes": size
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="compression-")
+    os.environ["DB_CONNECTION_STRING"] = args.db or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    os.environ.setdefault("FLASK_APP_KEY", "bench")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    import main as api
+    from models import db, Character
+    from compression import brotli
+    from cache import catalog_cache
+    app = api.create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Character.__table__.insert(), [{
+            "name": f"character{n}", "birth_year": "19BBY", "gender": "male", "height": 172, "mass": 77,
+            "skin_color": "fair", "eye_color": "blue", "hair_color": "blond"
+        } for n in range(args.rows)])
+        db.session.commit()
+
+    client = app.test_client()
+    body = client.get("/characters").get_data()
+
+    codecs = [(f"gzip -{level}", lambda data, level=level: gzip.compress(data, level, mtime=0)) for level in (1, 6, 9)]
+    if brotli is not None:
+        codecs += [(f"brotli q{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality)) for quality in (1, 4, 11)]
+    print(f"{'identity':<12} {len(body):>10} bytes")
+    for label, compress in codecs:
+        data, elapsed = time_codec(compress, body, args.repeat)
+        print(f"{label:<12} {len(data):>10} bytes  {len(body) / len(data):>5.1f}x  {elapsed * 1000:>8.2f} ms cpu  "
+              f"{len(body) / elapsed / 1e6:>7.1f} MB/s")
+
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        print(f"{encoding + ' cached:':<20}", time_requests(client, {"Accept-Encoding": encoding}, args.requests))
+    catalog_cache.max_entries = 0
+    catalog_cache.entries.clear()
+    for encoding in encodings:
+        print(f"{encoding + ' uncached:':<20}", time_requests(client, {"Accept-Encoding": encoding}, args.requests))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Favorite lookup latency with and without the (user_id, nature, nature_id)
+index.
+
+    $ python benchmarks/favorite_lookup.py --favorites 1000000
+
+Seeds a SQLite file (or --db URL) and times the old duplicate check (which did
+not filter on user_id) and the current one, before and after creating the
+index.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine, select, and_
+from models import db, User, Favorite
+
+def seed(engine, favorites, users, chunk=50000):
+    user_table = User.__table__
+    favorite_table = Favorite.__table__
+    per_user = max(1, favorites // users)
+    with engine.begin() as conn:
+        conn.execute(user_table.insert(), [
+            {"id": i, "name": f"user{i}", "username": f"user{i}", "password": "x", "email": f"user{i}@example.com"}
+            for i in range(1, users + 1)
+        ])
+    rows = []
+    with engine.begin() as conn:
+        for n in range(favorites):
+            user_id = n // per_user + 1
+            nature = "character" if n % 2 else "planet"
+            rows.append({"user_id": user_id, "name": f"fav{n}", "nature": nature, "nature_id": n})
+            if len(rows) >= chunk:
+                conn.execute(favorite_table.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(favorite_table.insert(), rows)
+    return per_user
+
+def time_lookups(engine, favorites, per_user, samples, with_user=True):
+    table = Favorite.__table__
+    clauses = [table.c.nature == db.bindparam("nature"), table.c.nature_id == db.bindparam("nature_id")]
+    if with_user:
+        clauses.append(table.c.user_id == db.bindparam("user_id"))
+    stmt = select(table.c.id).where(and_(*clauses)).limit(1)
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(samples):
+            n = random.randrange(favorites)
+            params = {"user_id": n // per_user + 1, "nature": "character" if n % 2 else "planet", "nature_id": n}
+            start = time.perf_counter()
+            conn.execute(stmt, params).first()
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.mean(timings), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite:///favorite_lookup.sqlite")
+    parser.add_argument("--favorites", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(args.db)
+    tables = [User.__table__, Favorite.__table__]
+    index = next(index for index in Favorite.__table__.indexes if index.name == "ix_favorite_user_nature")
+    db.metadata.drop_all(engine, tables=tables)
+    db.metadata.create_all(engine, tables=tables)
+    index.drop(engine)
+
+    start = time.perf_counter()
+    per_user = seed(engine, args.favorites, args.users)
+    print(f"seeded {args.favorites} favorites in {time.perf_counter() - start:.1f}s")
+
+    print("legacy check (no user_id):", time_lookups(engine, args.favorites, per_user, args.samples, with_user=False))
+    print("without index:            ", time_lookups(engine, args.favorites, per_user, args.samples))
+    index.create(engine)
+    print("with index:               ", time_lookups(engine, args.favorites, per_user, args.samples))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Throughput of a real gunicorn process at several worker / pool combinations.
+
+    $ python benchmarks/load_test.py --db postgresql://localhost/starwars \
+        --combos 1x5,2x5,4x10,8x10 --duration 10 --clients 32
+
+Each combo is `<workers>x<pool_size>`; gunicorn is started with
+WEB_CONCURRENCY / DB_POOL_SIZE set accordingly and hammered on --path by
+--clients keep-alive client threads.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+def seed(db_url, rows):
+    from flask import Flask
+    from models import db, Character
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = db_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        if Character.query.count() >= rows:
+            return
+        db.session.execute(Character.__table__.delete())
+        db.session.execute(Character.__table__.insert(), [{
+            "name": f"character{n}", "birth_year": "19BBY", "gender": "male", "height": 100 + n % 100,
+            "mass": 50 + n % 50, "skin_color": "fair", "eye_color": "blue", "hair_color": "blond"
+        } for n in range(rows)])
+        db.session.commit()
+
+def wait_ready(url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not answer on {url}")
+
+def drive(url, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return {
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+        "errors": errors[0]
+    }
+
+def run_combo(args, workers, pool_size, port):
+    env = dict(os.environ,
+        DB_CONNECTION_STRING=args.db,
+        FLASK_APP_KEY=os.environ.get("FLASK_APP_KEY", "benchmark"),
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        DB_POOL_SIZE=str(pool_size),
+        GUNICORN_WORKER_CLASS=args.worker_class,
+        GUNICORN_THREADS=str(args.threads)
+    )
+    process = subprocess.Popen(
+        ["gunicorn", "wsgi", "--chdir", "./src/", "--config", "./gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{args.path}"
+        wait_ready(url)
+        drive(url, args.clients, 1)  # warm up
+        return drive(url, args.clients, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite:///" + os.path.abspath("load_test.sqlite"))
+    parser.add_argument("--combos", default="1x5,2x5,4x10")
+    parser.add_argument("--worker-class", default="gthread")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--path", default="/characters?limit=50")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=18000)
+    args = parser.parse_args()
+
+    seed(args.db, args.rows)
+    print(f"{'workers':>7} {'pool':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for number, combo in enumerate(args.combos.split(",")):
+        workers, pool_size = (int(part) for part in combo.split("x"))
+        result = run_combo(args, workers, pool_size, args.port + number)
+        print(f"{workers:>7} {pool_size:>5} {result['rps']:>9} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Serialization throughput: full ORM hydration + `serialize()` against the
+column-only projection used by `?fields=`.
+
+    $ python benchmarks/projection.py --rows 100000 --fields id,name
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flask import Flask
+from models import db, Character
+from projection import projection
+
+def seed(rows, chunk=20000):
+    batch = []
+    for n in range(rows):
+        batch.append({
+            "name": f"character{n}", "birth_year": "19BBY", "gender": "male", "height": 172, "mass": 77,
+            "skin_color": "fair", "eye_color": "blue", "hair_color": "blond"
+        })
+        if len(batch) >= chunk:
+            db.session.execute(Character.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Character.__table__.insert(), batch)
+    db.session.commit()
+
+def projected(fields):
+    query, serialize = projection(Character, fields)
+    return [serialize(row) for row in query]
+
+def measure(label, run, repeat):
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        count = len(run())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {count / best:>12,.0f} rows/s  ({best * 1000:.1f} ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--fields", default="id,name")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = args.db
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    with app.test_request_context():
+        db.create_all()
+        seed(args.rows)
+        fields = tuple(args.fields.split(","))
+
+        measure("ORM + serialize()", lambda: [item.serialize() for item in Character.query.all()], args.repeat)
+        measure("projection (all fields)", lambda: projected(Character.serialize_fields), args.repeat)
+        measure(f"projection ({args.fields})", lambda: projected(fields), args.repeat)
+
+if __name__ == "__main__":
+    main()
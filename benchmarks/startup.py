@@ -0,0 +1,87 @@
+"""
+Cold start time of the API: `import main; create_app()` in a fresh interpreter.
+
+    $ python benchmarks/startup.py
+    $ python benchmarks/startup.py --budget-ms 1500      # exit 1 over budget (CI)
+    $ python benchmarks/startup.py --importtime 15       # slowest imports
+
+Every run is a new process, the median of --runs is compared with the budget
+for the full app (admin, population and sitemap enabled). The minimal profile
+shows what the toggles save.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+
+PROFILES = {
+    "full": {},
+    "minimal": {"ADMIN_ENABLED": "0", "POPULATION_ENABLED": "0", "SITEMAP_ENABLED": "0"}
+}
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+import main
+main.create_app()
+print((time.perf_counter() - start) * 1000)
+"""
+
+def environment(profile, db_url):
+    env = dict(os.environ, DB_CONNECTION_STRING=db_url, FLASK_APP_KEY="startup")
+    env.update(PROFILES[profile])
+    return env
+
+def time_startup(profile, db_url, runs):
+    inside, wall = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", SNIPPET.format(src=SRC)], env=environment(profile, db_url),
+                                check=True, capture_output=True, text=True).stdout
+        wall.append((time.perf_counter() - start) * 1000)
+        inside.append(float(output.strip().splitlines()[-1]))
+    return {"create_app_ms": round(statistics.median(inside), 1), "process_ms": round(statistics.median(wall), 1)}
+
+def slowest_imports(profile, db_url, count):
+    # `-X importtime` writes "import time: self [us] | cumulative | package" to stderr
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", SNIPPET.format(src=SRC)], env=environment(profile, db_url),
+                            check=True, capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # main itself and what it imports directly
+        if not name.startswith("    "):
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail when the full profile's create_app_ms median is above it.")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Also list the N slowest imports made by main.")
+    args = parser.parse_args()
+
+    db_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="startup-"), "startup.sqlite")
+    results = {profile: time_startup(profile, db_url, args.runs) for profile in PROFILES}
+    for profile, result in results.items():
+        print(f"{profile:<8} create_app {result['create_app_ms']:>7} ms  process {result['process_ms']:>7} ms")
+
+    if args.importtime:
+        for cumulative, name in slowest_imports("full", db_url, args.importtime):
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    if args.budget_ms is not None and results["full"]["create_app_ms"] > args.budget_ms:
+        print(f"over budget: {results['full']['create_app_ms']} ms > {args.budget_ms} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Endpoint benchmark suite.
+
+    $ python benchmarks/suite.py --scale 1k
+    $ python benchmarks/suite.py --scale 100k --mode gunicorn --db postgresql://localhost/bench
+    $ python benchmarks/suite.py --scale 1k --save-baseline benchmarks/baseline.json
+
+Seeds users, characters, planets, favorites and revoked tokens (so protected
+routes check a populated blocklist) at the given scale, drives
+every route of the API through the Flask test client (or a real gunicorn
+process) and reports p50/p95/p99 latency, requests per second and peak RSS
+per scenario. Results are compared with --baseline (benchmarks/baseline.json
+by default); a p95 or req/s change beyond --threshold is flagged.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from swapi_stub import SwapiStub
+
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+BENCH_USER = {"name": "Bench", "username": "bench", "email": "bench@example.com", "password": "bench"}
+
+## SEED ##
+
+def seed(db_url, rows, chunk=20000):
+    from sqlalchemy import create_engine
+    from models import db, User, Character, Planet, Favorite, FavoriteCount, RevokedToken
+
+    engine = create_engine(db_url)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    users = max(10, rows // 100)
+
+    def insert(table, make, count):
+        with engine.begin() as conn:
+            for start in range(0, count, chunk):
+                conn.execute(table.insert(), [make(n) for n in range(start, min(start + chunk, count))])
+
+    insert(User.__table__, lambda n: dict(BENCH_USER) if n == 0 else {
+        "name": f"user{n}", "username": f"user{n}", "email": f"user{n}@example.com", "password": "x"
+    }, users)
+    insert(Character.__table__, lambda n: {
+        "name": f"character{n}", "birth_year": f"{n % 900}BBY", "gender": "male" if n % 2 else "female",
+        "height": 100 + n % 120, "mass": 40 + n % 100, "skin_color": "fair",
+        "eye_color": ("blue", "brown", "yellow", "red")[n % 4], "hair_color": "black"
+    }, rows)
+    insert(Planet.__table__, lambda n: {
+        "name": f"planet{n}", "diameter": 1000 + n % 20000, "gravity": "1 standard",
+        "terrain": ("desert", "jungle", "ice", "ocean")[n % 4], "surface_water": "10",
+        "population": n * 1000, "rotation_period": 24, "orbital_period": 300 + n % 200
+    }, rows)
+    insert(Favorite.__table__, lambda n: {
+        "user_id": n % users + 1, "name": f"favorite{n}", "nature": "character" if n % 2 else "planet", "nature_id": n + 1
+    }, rows)
+    # the counters of the favorites above, one favorite per row
+    insert(FavoriteCount.__table__, lambda n: {
+        "nature": "character" if n % 2 else "planet", "nature_id": n + 1, "count": 1
+    }, rows)
+    # logged out tokens, and every other user revoked once; the bench user's tokens stay valid
+    insert(RevokedToken.__table__, lambda n: {
+        "key": f"sub:{n // 2 + 2}" if n % 2 and n // 2 + 2 <= users else f"jti:revoked-{n}",
+        "revoked_at": datetime(2020, 1, 1)
+    }, rows)
+    engine.dispose()
+
+## DRIVERS ##
+
+class TestClientDriver:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.client.open(path, method=method, json=json, headers=headers)
+        size = len(response.get_data())
+        response.close()
+        return response.status_code, size, response
+
+    def json(self, response):
+        return response.get_json()
+
+    def peak_rss_mb(self):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class HttpDriver:
+
+    def __init__(self, base_url, pid):
+        import requests
+        self.base_url = base_url
+        self.pid = pid
+        self.session = requests.Session()
+
+    def request(self, method, path, json=None, headers=None):
+        response = self.session.request(method, self.base_url + path, json=json, headers=headers, timeout=300)
+        return response.status_code, len(response.content), response
+
+    def json(self, response):
+        return response.json()
+
+    def peak_rss_mb(self):
+        # highest VmHWM among the gunicorn workers
+        peak = 0
+        try:
+            with open(f"/proc/{self.pid}/task/{self.pid}/children") as children:
+                pids = children.read().split()
+        except OSError:
+            return None
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/status") as status:
+                    for line in status:
+                        if line.startswith("VmHWM:"):
+                            peak = max(peak, int(line.split()[1]) / 1024)
+            except OSError:
+                pass
+        return peak
+
+## SCENARIOS ##
+
+def scenarios(rows, auth):
+    """
+    (name, setup) pairs. `setup(driver, i)` returns the `(method, path, kwargs)`
+    timed for iteration i and may make untimed requests of its own first.
+    """
+    def fixed(method, path, **kwargs):
+        return lambda driver, i: (method, path, kwargs)
+
+    def with_auth(method, path, **kwargs):
+        return lambda driver, i: (method, path, dict(kwargs, headers=dict(kwargs.get("headers", {}), **auth(driver))))
+
+    def new_user(driver, i):
+        username = f"bench-new-{time.monotonic_ns()}-{i}"
+        return "POST", "/users", {"json": {"name": "n", "username": username, "email": f"{username}@x", "password": "p"}}
+
+    def delete_user(driver, i):
+        _, _, kwargs = new_user(driver, i)
+        body = kwargs["json"]
+        driver.request("POST", "/users", json=body)
+        _, _, response = driver.request("POST", "/login", json={"username": body["username"], "password": "p"})
+        return "DELETE", "/users", {"headers": {"Authorization": "Bearer " + driver.json(response)["token"]}}
+
+    def logout(driver, i):
+        # a fresh token each time, the shared one stays valid
+        _, _, response = driver.request("POST", "/login", json={"username": "bench", "password": "bench"})
+        return "POST", "/logout", {"headers": {"Authorization": "Bearer " + driver.json(response)["token"]}}
+
+    def new_character(driver, i):
+        return "POST", "/characters", {"json": {
+            "name": f"new-character-{time.monotonic_ns()}-{i}"[:50], "birth_year": "1BBY", "gender": "male",
+            "height": 180, "mass": 80, "skin_color": "fair", "eye_color": "blue", "hair_color": "black"
+        }}
+
+    def new_planet(driver, i):
+        return "POST", "/planets", {"json": {
+            "name": f"new-planet-{time.monotonic_ns()}-{i}"[:50], "rotation_period": 24, "orbital_period": 300,
+            "diameter": 1000, "climate": "arid", "gravity": "1", "terrain": "desert", "surface_water": "1", "population": 10
+        }}
+
+    def favorite(nature):
+        def setup(driver, i):
+            nature_id = (i * 7919) % rows + 1
+            path = f"/favorite/{nature}/{nature_id}"
+            driver.request("DELETE", path, headers=auth(driver))
+            return "POST", path, {"json": {"name": f"{nature}{nature_id - 1}"}, "headers": auth(driver)}
+        return setup
+
+    def favorite_delete(nature):
+        def setup(driver, i):
+            method, path, kwargs = favorite(nature)(driver, i)
+            driver.request(method, path, **kwargs)
+            return "DELETE", path, {"headers": auth(driver)}
+        return setup
+
+    def batch(i):
+        return [{"nature": "character" if n % 2 else "planet", "nature_id": (i * 31 + n) % rows + 1} for n in range(20)]
+
+    def batch_delete(driver, i):
+        driver.request("POST", "/users/favorites/batch", json=batch(i), headers=auth(driver))
+        return "DELETE", "/users/favorites/batch", {"json": batch(i), "headers": auth(driver)}
+
+    ids = ",".join(str(n * 97 % rows + 1) for n in range(50))
+    detail = lambda kind: (lambda driver, i: ("GET", f"/{kind}/{(i * 7919) % rows + 1}", {}))
+    gzip = {"Accept-Encoding": "gzip"}
+
+    return [
+        ("sitemap", fixed("GET", "/")),
+        ("login", fixed("POST", "/login", json={"username": "bench", "password": "bench"})),
+        ("logout", logout),
+        ("users.page", with_auth("GET", "/users?limit=50")),
+        ("users.stream", with_auth("GET", "/users")),
+        ("users.create", new_user),
+        ("users.delete", delete_user),
+        ("characters.page", fixed("GET", "/characters?limit=50")),
+        ("characters.page_deep", fixed("GET", f"/characters?limit=50&after={rows - 100}")),
+        ("characters.stream", fixed("GET", "/characters")),
+        ("characters.filtered", fixed("GET", "/characters?eye_color=blue&sort=-height&limit=50")),
+        ("characters.fields", fixed("GET", "/characters?fields=id,name&limit=50")),
+        ("characters.multiget", fixed("GET", f"/characters?ids={ids}")),
+        ("characters.detail", detail("characters")),
+        ("characters.create", new_character),
+        ("characters.export", fixed("GET", "/characters/export")),
+        ("characters.export_gzip", fixed("GET", "/characters/export", headers=gzip)),
+        ("characters.export_csv", fixed("GET", "/characters/export?format=csv")),
+        ("planets.page", fixed("GET", "/planets?limit=50")),
+        ("planets.stream", fixed("GET", "/planets")),
+        ("planets.filtered", fixed("GET", "/planets?terrain=desert&sort=population&limit=50")),
+        ("planets.multiget", fixed("GET", f"/planets?ids={ids}")),
+        ("planets.detail", detail("planets")),
+        ("planets.create", new_planet),
+        ("planets.export", fixed("GET", "/planets/export")),
+        ("planets.export_gzip", fixed("GET", "/planets/export", headers=gzip)),
+        ("planets.export_csv", fixed("GET", "/planets/export?format=csv")),
+        ("favorites.list", with_auth("GET", "/users/favorites")),
+        ("favorites.expand", with_auth("GET", "/users/favorites?expand=1")),
+        ("favorites.export", with_auth("GET", "/users/favorites/export")),
+        ("favorites.export_gzip", with_auth("GET", "/users/favorites/export", headers=gzip)),
+        ("favorites.export_csv", with_auth("GET", "/users/favorites/export?format=csv")),
+        ("favorites.add_character", favorite("character")),
+        ("favorites.add_planet", favorite("planet")),
+        ("favorites.delete_character", favorite_delete("character")),
+        ("favorites.delete_planet", favorite_delete("planet")),
+        ("favorites.batch_add", lambda driver, i: ("POST", "/users/favorites/batch", {"json": batch(i), "headers": auth(driver)})),
+        ("favorites.batch_delete", batch_delete),
+        ("stats.favorites_top", fixed("GET", "/stats/favorites/top?nature=character")),
+        ("stats.favorites_top_max", fixed("GET", "/stats/favorites/top?nature=planet&limit=100")),
+        ("stats.favorite_count", lambda driver, i: ("GET", f"/stats/favorites/{('character', 'planet')[i % 2]}/{(i * 7919) % rows + 1}", {})),
+        ("stats.cache", fixed("GET", "/stats/cache")),
+        ("metrics", fixed("GET", "/metrics")),
+        ("population.characters", fixed("POST", "/population/characters")),
+        ("population.planets", fixed("POST", "/population/planets")),
+    ]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_scenario(driver, setup, iterations, max_seconds):
+    timings = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        method, path, kwargs = setup(driver, i)
+        start = time.perf_counter()
+        status, size, _ = driver.request(method, path, **kwargs)
+        timings.append(time.perf_counter() - start)
+        if status >= 400:
+            errors += 1
+        if time.perf_counter() - started > max_seconds:
+            break
+    timings.sort()
+    return {
+        "iterations": len(timings),
+        "errors": errors,
+        "p50_ms": round(percentile(timings, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+        "rps": round(len(timings) / sum(timings), 1),
+        "peak_rss_mb": round(driver.peak_rss_mb() or 0, 1)
+    }
+
+## COMPARE ##
+
+def compare(results, baseline, threshold):
+    print(f"\n{'scenario':<30} {'p95 ms':>10} {'base':>10} {'change':>8} {'req/s':>9} {'base':>9} {'change':>8}")
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<30} {result['p95_ms']:>10} {'-':>10} {'new':>8} {result['rps']:>9} {'-':>9} {'new':>8}")
+            continue
+        p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0
+        rps_change = (result["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0
+        flag = ""
+        if p95_change > threshold or rps_change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<30} {result['p95_ms']:>10} {base['p95_ms']:>10} {p95_change:>+8.0%} {result['rps']:>9} {base['rps']:>9} {rps_change:>+8.0%}{flag}")
+    return regressions
+
+## MAIN ##
+
+def start_gunicorn(db_url, port, workers, swapi_url):
+    env = dict(os.environ,
+        DB_CONNECTION_STRING=db_url, FLASK_APP_KEY="benchmark", PORT=str(port),
+        WEB_CONCURRENCY=str(workers), SWAPI_BASE_URL=swapi_url, QUERY_BUDGET_MODE="log"
+    )
+    process = subprocess.Popen(
+        ["gunicorn", "wsgi", "--chdir", "./src/", "--config", "./gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    import requests
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/stats/cache", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--mode", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--db", default=None, help="database URL, a temporary SQLite file by default")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--max-seconds", type=float, default=5, help="time cap per scenario")
+    parser.add_argument("--only", default=None, help="comma separated scenario name prefixes")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=18900)
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json"))
+    parser.add_argument("--save-baseline", default=None, help="write the results to this file")
+    parser.add_argument("--output", default=None, help="write the results JSON here")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = SCALES[args.scale]
+    temporary = None
+    db_url = args.db
+    if db_url is None:
+        temporary = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False)
+        db_url = "sqlite:///" + temporary.name
+
+    start = time.perf_counter()
+    seed(db_url, rows)
+    print(f"seeded {args.scale} ({rows} rows per table) in {time.perf_counter() - start:.1f}s")
+
+    stub = SwapiStub().start()
+    os.environ.update(DB_CONNECTION_STRING=db_url, FLASK_APP_KEY="benchmark", SWAPI_BASE_URL=stub.base_url)
+    os.environ.setdefault("QUERY_BUDGET_MODE", "log")
+    process = None
+    if args.mode == "gunicorn":
+        process = start_gunicorn(db_url, args.port, args.workers, stub.base_url)
+        driver = HttpDriver(f"http://127.0.0.1:{args.port}", process.pid)
+    else:
+        from main import create_app
+        app = create_app({"QUERY_BUDGET_MODE": os.environ["QUERY_BUDGET_MODE"]})
+        driver = TestClientDriver(app)
+
+    tokens = {}
+    def auth(driver):
+        if "bench" not in tokens:
+            _, _, response = driver.request("POST", "/login", json={"username": "bench", "password": "bench"})
+            tokens["bench"] = "Bearer " + driver.json(response)["token"]
+        return {"Authorization": tokens["bench"]}
+
+    results = {}
+    try:
+        only = args.only.split(",") if args.only else None
+        for name, setup in scenarios(rows, auth):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            results[name] = run_scenario(driver, setup, args.iterations, args.max_seconds)
+            result = results[name]
+            print(f"{name:<30} p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  "
+                  f"{result['rps']:>9} req/s  rss {result['peak_rss_mb']:>7} MB  n={result['iterations']} errors={result['errors']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        stub.stop()
+        if temporary is not None:
+            os.unlink(temporary.name)
+
+    report = {
+        "meta": {"scale": args.scale, "mode": args.mode, "db": db_url.split("://")[0], "python": platform.python_version()},
+        "results": results
+    }
+    key = f"{args.mode}:{args.scale}"
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get(key, {}).get("results", {})
+        if baseline:
+            regressions = compare(results, baseline, args.threshold)
+            print(f"\n{len(regressions)} regression(s) against {os.path.basename(args.baseline)} [{key}]")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                stored = json.load(f)
+        stored[key] = report
+        with open(args.save_baseline, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+A local stand-in for SWAPI so ingestion can be benchmarked without the network.
+
+    $ python benchmarks/swapi_stub.py --port 8765 --people 82 --planets 60
+    $ SWAPI_BASE_URL=http://127.0.0.1:8765/api pipenv run start
+
+Listings are paginated ten at a time with `next` links like the real API.
+Responses carry an ETag and answer `If-None-Match` with 304.
+"""
+import argparse
+import hashlib
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PAGE_SIZE = 10
+EDITED = "2014-12-20T21:17:56.891000Z"
+
+def make_people(count):
+    return [{
+        "name": f"Person {n}", "birth_year": f"{n}BBY", "gender": "male" if n % 2 else "female",
+        "height": str(150 + n % 60), "mass": "unknown" if n % 17 == 0 else str(50 + n % 70),
+        "skin_color": "fair", "eye_color": "blue" if n % 3 else "brown", "hair_color": "blond",
+        "created": EDITED, "edited": EDITED
+    } for n in range(1, count + 1)]
+
+def make_planets(count):
+    return [{
+        "name": f"Planet {n}", "diameter": str(1000 * n), "gravity": "1 standard", "terrain": "desert",
+        "surface_water": str(n % 100), "population": "unknown" if n % 13 == 0 else str(10000 * n),
+        "rotation_period": "24", "orbital_period": str(300 + n), "climate": "arid",
+        "created": EDITED, "edited": EDITED
+    } for n in range(1, count + 1)]
+
+class SwapiStub:
+
+    def __init__(self, port=0, people=82, planets=60, host="127.0.0.1"):
+        self.resources = {"people": make_people(people), "planets": make_planets(planets)}
+        self.requests = 0
+        self.not_modified = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                status, body = stub.route(self.path)
+                payload = json.dumps(body).encode("utf-8")
+                etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    stub.not_modified += 1
+                    status, payload = 304, b""
+                self.send_response(status)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/api"
+
+    def route(self, path):
+        path, _, query = path.partition("?")
+        parts = path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "api" or parts[1] not in self.resources:
+            return 404, {"detail": "Not found"}
+        resource = parts[1]
+        rows = self.resources[resource]
+        if len(parts) == 3:
+            index = int(parts[2]) - 1
+            if not 0 <= index < len(rows):
+                return 404, {"detail": "Not found"}
+            return 200, self.item(resource, index)
+        page = int(query.split("page=")[1].split("&")[0]) if "page=" in query else 1
+        start = (page - 1) * PAGE_SIZE
+        return 200, {
+            "count": len(rows),
+            "next": f"{self.base_url}/{resource}/?page={page + 1}" if start + PAGE_SIZE < len(rows) else None,
+            "previous": f"{self.base_url}/{resource}/?page={page - 1}" if page > 1 else None,
+            "results": [self.item(resource, index) for index in range(start, min(start + PAGE_SIZE, len(rows)))]
+        }
+
+    def item(self, resource, index):
+        return dict(self.resources[resource][index], url=f"{self.base_url}/{resource}/{index + 1}/")
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--people", type=int, default=82)
+    parser.add_argument("--planets", type=int, default=60)
+    args = parser.parse_args()
+    stub = SwapiStub(args.port, args.people, args.planets)
+    print(f"SWAPI stub on {stub.base_url}")
+    stub.server.serve_forever()
+
+if __name__ == "__main__":
+    main()
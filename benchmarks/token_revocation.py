@@ -0,0 +1,86 @@
+"""
+Overhead of the JWT revocation check on a protected route.
+
+    $ python benchmarks/token_revocation.py --revoked 100000 --requests 2000
+
+Seeds --revoked revocations into a temporary SQLite file (or --db URL) and
+times `GET /users/favorites` through the Flask test client with the check
+disabled, with a naive loader that queries the table on every request, and
+with the bloom filter + cache blocklist.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+def time_requests(client, headers, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get("/users/favorites", headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "req_s": round(count / (sum(timings) / 1000), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--revoked", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="token-revocation-")
+    os.environ["DB_CONNECTION_STRING"] = args.db or f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}"
+    os.environ.setdefault("FLASK_APP_KEY", "bench")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+    import main as api
+    app = api.create_app()
+    from models import db, User, RevokedToken
+    from revocation import token_blocklist, token_keys
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(name="Bench", username="bench", email="bench@example.com", password="bench"))
+        table = RevokedToken.__table__
+        for start in range(0, args.revoked, 50000):
+            db.session.execute(table.insert(), [
+                {"key": f"jti:{uuid.uuid4()}"} for _ in range(start, min(start + 50000, args.revoked))
+            ])
+        db.session.commit()
+
+    client = app.test_client()
+    token = client.post("/login", json={"username": "bench", "password": "bench"}).json["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def naive_check(jwt_header, jwt_payload):
+        keys = token_keys(jwt_payload)
+        return db.session.query(RevokedToken.id).filter(RevokedToken.key.in_(keys)).first() is not None
+
+    token_blocklist.enabled = False
+    print("no revocation check:", time_requests(client, headers, args.requests))
+
+    api.jwt.token_in_blocklist_loader(naive_check)
+    print("query per request:  ", time_requests(client, headers, args.requests))
+
+    api.jwt.token_in_blocklist_loader(token_blocklist.check_token)
+    token_blocklist.enabled = True
+    token_blocklist.reset()
+    start = time.perf_counter()
+    with app.app_context():
+        token_blocklist.refresh(force=True)
+    print(f"bloom filter loaded {args.revoked} keys in {time.perf_counter() - start:.2f}s")
+    print("bloom filter + cache:", time_requests(client, headers, args.requests))
+    print(token_blocklist.stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Record validation throughput: the per-kwarg `hasattr` / `python_type`
+constructor the models used to have, against the compiled schema.
+
+    $ python benchmarks/validation.py --rows 100000
+
+No database is touched, the rows are SWAPI shaped people records
+("1,358" masses, "unknown" heights) built in memory.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from models import Character
+
+def legacy_init(instance, **kwargs):
+    # the constructor Character had before the schema, kept here for comparison
+    for (key, value) in kwargs.items():
+        if hasattr(instance, key):
+            attr_type = getattr(instance.__class__, key).type
+            try:
+                attr_type.python_type(value)
+                setattr(instance, key, value)
+            except Exception:
+                pass
+    return instance
+
+def legacy_constructor(records):
+    # Character() sets up the instance state, the kwargs loop is what differs
+    return [legacy_init(Character(), **data) for data in records]
+
+def records(rows):
+    masses = ("77", "1,358", "unknown", "78.2")
+    return [{
+        "name": f"Person {n}", "birth_year": "19BBY", "gender": "male", "height": "unknown" if n % 17 == 0 else str(150 + n % 60),
+        "mass": masses[n % len(masses)], "skin_color": "fair", "eye_color": "blue", "hair_color": "blond",
+        "url": f"https://swapi.dev/api/people/{n}/", "edited": "2014-12-20T21:17:56.891000Z"
+    } for n in range(rows)]
+
+def measure(label, run, repeat, rows):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {rows / best:>12,.0f} rows/s  ({best * 1000:.1f} ms)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = records(args.rows)
+    schema = Character.schema()
+    rows, failures = schema.validate_many(data)
+    print(f"{len(rows)} valid, {len(failures)} rejected, e.g. {failures[0]['errors'] if failures else None}")
+
+    measure("legacy constructor", lambda: legacy_constructor(data), args.repeat, args.rows)
+    measure("Character(**record)", lambda: [Character(**record) for record in data], args.repeat, args.rows)
+    measure("schema.validate_many", lambda: schema.validate_many(data), args.repeat, args.rows)
+    measure("Character.validate_records", lambda: Character.validate_records(data), args.repeat, args.rows)
+
+if __name__ == "__main__":
+    main()
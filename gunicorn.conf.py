@@ -0,0 +1,28 @@
+# Gunicorn settings, every value can be overridden from the environment.
+# Read more about them here: https://docs.gunicorn.org/en/stable/settings.html
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes", "on")
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", None)
+
+
+def post_fork(server, worker):
+    # the master may have opened connections while preloading the app
+    from wsgi import application
+    from models import db
+    from database import dispose_engine
+    dispose_engine(application, db)
+
+
+def child_exit(server, worker):
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
@@ -0,0 +1,28 @@
+"""catalog version counters
+
+Revision ID: 4c1f7a9e2d10
+Revises: bb473e995022
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f7a9e2d10'
+down_revision = 'bb473e995022'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_version',
+    sa.Column('name', sa.String(length=25), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_version')
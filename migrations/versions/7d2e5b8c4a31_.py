@@ -0,0 +1,24 @@
+"""favorite (user_id, nature, nature_id) index
+
+Revision ID: 7d2e5b8c4a31
+Revises: 4c1f7a9e2d10
+Create Date: 2026-10-18 10:03:15.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e5b8c4a31'
+down_revision = '4c1f7a9e2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_favorite_user_nature', 'favorite', ['user_id', 'nature', 'nature_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_favorite_user_nature', table_name='favorite')
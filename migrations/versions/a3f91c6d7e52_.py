@@ -0,0 +1,42 @@
+"""catalog filter and sort indexes
+
+Revision ID: a3f91c6d7e52
+Revises: 7d2e5b8c4a31
+Create Date: 2026-10-18 11:26:02.774519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f91c6d7e52'
+down_revision = '7d2e5b8c4a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_character_gender'), 'character', ['gender'], unique=False)
+    op.create_index(op.f('ix_character_skin_color'), 'character', ['skin_color'], unique=False)
+    op.create_index(op.f('ix_character_eye_color'), 'character', ['eye_color'], unique=False)
+    op.create_index(op.f('ix_character_hair_color'), 'character', ['hair_color'], unique=False)
+    op.create_index('ix_character_height_id', 'character', ['height', 'id'], unique=False)
+    op.create_index('ix_character_mass_id', 'character', ['mass', 'id'], unique=False)
+    op.create_index(op.f('ix_planet_gravity'), 'planet', ['gravity'], unique=False)
+    op.create_index(op.f('ix_planet_terrain'), 'planet', ['terrain'], unique=False)
+    op.create_index('ix_planet_diameter_id', 'planet', ['diameter', 'id'], unique=False)
+    op.create_index('ix_planet_population_id', 'planet', ['population', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_planet_population_id', table_name='planet')
+    op.drop_index('ix_planet_diameter_id', table_name='planet')
+    op.drop_index(op.f('ix_planet_terrain'), table_name='planet')
+    op.drop_index(op.f('ix_planet_gravity'), table_name='planet')
+    op.drop_index('ix_character_mass_id', table_name='character')
+    op.drop_index('ix_character_height_id', table_name='character')
+    op.drop_index(op.f('ix_character_hair_color'), table_name='character')
+    op.drop_index(op.f('ix_character_eye_color'), table_name='character')
+    op.drop_index(op.f('ix_character_skin_color'), table_name='character')
+    op.drop_index(op.f('ix_character_gender'), table_name='character')
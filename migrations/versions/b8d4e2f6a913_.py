@@ -0,0 +1,42 @@
+"""catalog source url, edited and content hash
+
+Revision ID: b8d4e2f6a913
+Revises: e5c27b9d1f48
+Create Date: 2026-10-18 15:41:09.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4e2f6a913'
+down_revision = 'e5c27b9d1f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('character') as batch_op:
+        batch_op.add_column(sa.Column('source_url', sa.String(length=250), nullable=True))
+        batch_op.add_column(sa.Column('edited', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=40), nullable=True))
+        batch_op.create_unique_constraint('uq_character_source_url', ['source_url'])
+    with op.batch_alter_table('planet') as batch_op:
+        batch_op.add_column(sa.Column('source_url', sa.String(length=250), nullable=True))
+        batch_op.add_column(sa.Column('edited', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=40), nullable=True))
+        batch_op.create_unique_constraint('uq_planet_source_url', ['source_url'])
+
+
+def downgrade():
+    with op.batch_alter_table('planet') as batch_op:
+        batch_op.drop_constraint('uq_planet_source_url', type_='unique')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('edited')
+        batch_op.drop_column('source_url')
+    with op.batch_alter_table('character') as batch_op:
+        batch_op.drop_constraint('uq_character_source_url', type_='unique')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('edited')
+        batch_op.drop_column('source_url')
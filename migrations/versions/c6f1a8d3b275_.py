@@ -0,0 +1,36 @@
+"""favorite count table
+
+Revision ID: c6f1a8d3b275
+Revises: b8d4e2f6a913
+Create Date: 2026-10-18 16:02:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8d3b275'
+down_revision = 'b8d4e2f6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('favorite_count',
+    sa.Column('nature', sa.String(length=50), nullable=False),
+    sa.Column('nature_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('nature', 'nature_id')
+    )
+    op.create_index('ix_favorite_count_nature_count', 'favorite_count', ['nature', 'count', 'nature_id'], unique=False)
+    # counts for the favorites that already exist
+    op.execute(
+        "INSERT INTO favorite_count (nature, nature_id, count) "
+        "SELECT nature, nature_id, COUNT(*) FROM favorite GROUP BY nature, nature_id"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_favorite_count_nature_count', table_name='favorite_count')
+    op.drop_table('favorite_count')
@@ -0,0 +1,30 @@
+"""revoked token table
+
+Revision ID: e5c27b9d1f48
+Revises: a3f91c6d7e52
+Create Date: 2026-10-18 15:20:41.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c27b9d1f48'
+down_revision = 'a3f91c6d7e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revoked_token',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('revoked_token')
@@ -1,18 +1,188 @@
+"""
+Admin views built for large tables:
+
+- the list count comes from the planner statistics (`pg_class.reltuples`,
+  `information_schema.TABLES`) or `max(id)` instead of `COUNT(*)`, and is
+  only exact below `exact_count_below` rows,
+- walking the list page by page in primary key order is keyset paginated
+  (`WHERE id > :last_id LIMIT :page_size`), OFFSET is only used for jumps,
+- the list query loads the displayed columns only,
+- the flask-admin scaffolding (forms, filters, columns) runs on the first
+  request to a view instead of at app startup.
+
+Edits and deletes of catalog rows bump the catalog cache version in the
+same transaction, like the API writers do.
+"""
 import os
+import threading
+from collections import OrderedDict
 from flask_admin import Admin
 from models import db, User, Favorite, Character, Planet
+from cache import catalog_cache
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import text
+from sqlalchemy.orm import load_only
+
+def estimated_count(session, model):
+    """
+    A cheap row count estimate: the planner statistics when the dialect keeps
+    them, otherwise the highest primary key.
+    """
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    estimate = None
+    if dialect == "postgresql":
+        estimate = session.execute(text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table.name}).scalar()
+    elif dialect == "mysql":
+        estimate = session.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+        ), {"name": table.name}).scalar()
+    # reltuples is -1 for a table that was never analyzed
+    if estimate is None or estimate < 0:
+        estimate = session.query(db.func.max(model.id)).scalar()
+    return int(estimate or 0)
+
+class ScalableModelView(ModelView):
+    page_size = 50
+    can_set_page_size = True
+    # below this estimate an exact COUNT(*) is cheap enough
+    exact_count_below = 100000
+    # (first, last) primary keys of recently served pages
+    max_page_cursors = 1024
+    # the catalog cache kind whose version a change bumps, None when not cached
+    catalog_kind = None
+
+    def __init__(self, *args, **kwargs):
+        self._scaffolded = False
+        self._scaffold_lock = threading.Lock()
+        self._page_cursors = OrderedDict()
+        super().__init__(*args, **kwargs)
+
+    ## LAZY SCAFFOLDING ##
+
+    def _refresh_cache(self):
+        # deferred to the first request, see _handle_view
+        self._scaffolded = False
+
+    def _scaffold(self):
+        with self._scaffold_lock:
+            if not self._scaffolded:
+                super()._refresh_cache()
+                self._scaffolded = True
+                if not self.column_select_related_list:
+                    self._auto_joins = self.scaffold_auto_joins()
+
+    def scaffold_auto_joins(self):
+        # needs the list columns, it runs again once they are scaffolded
+        if not self._scaffolded:
+            return []
+        return super().scaffold_auto_joins()
+
+    def _handle_view(self, name, **kwargs):
+        if not self._scaffolded:
+            self._scaffold()
+        return super()._handle_view(name, **kwargs)
+
+    ## CACHE INVALIDATION ##
+
+    # flask-admin commits right after these hooks
+    def on_model_change(self, form, model, is_created):
+        super().on_model_change(form, model, is_created)
+        if self.catalog_kind is not None:
+            catalog_cache.bump(self.catalog_kind)
+
+    def on_model_delete(self, model):
+        super().on_model_delete(model)
+        if self.catalog_kind is not None:
+            catalog_cache.bump(self.catalog_kind)
+
+    ## PROJECTION ##
+
+    def list_column_names(self):
+        columns = self.model.__table__.c
+        return [name for name, label in self._list_columns if name in columns]
+
+    def get_query(self):
+        return super().get_query().options(load_only(*self.list_column_names()))
+
+    ## LISTING ##
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        estimate = estimated_count(self.session, self.model)
+        if estimate < self.exact_count_below:
+            return super().get_list(page, sort_column, sort_desc, search, filters, execute=execute, page_size=page_size)
+
+        page_size = page_size if page_size is not None else self.page_size
+        joins = {}
+        query = self.get_query()
+        if self._search_supported and search:
+            query, _, joins, _ = self._apply_search(query, None, joins, {}, search)
+        if filters and self._filters:
+            query, _, joins, _ = self._apply_filters(query, None, joins, {}, filters)
+        # the estimate only describes the whole table, filtered lists get the simple pager
+        count = None if search or filters else estimate
+
+        pk = self.model.id
+        if sort_column is not None and sort_column != pk.key:
+            query, joins = self._apply_sorting(query, joins, sort_column, sort_desc)
+            query = self._apply_pagination(query, page, page_size)
+            return count, query.all() if execute else query
+
+        key = (search, tuple(filters or ()), bool(sort_desc), page_size)
+        previous = self._page_cursors.get(key + (page - 1,)) if page else None
+        following = self._page_cursors.get(key + (page + 1,)) if page else None
+        reverse = False
+        if not page or not page_size or not execute:
+            query = self._apply_pagination(query.order_by(pk.desc() if sort_desc else pk), page, page_size)
+        elif previous is not None:
+            # next page: continue after the last key of the previous one
+            last = previous[1]
+            query = query.filter(pk < last if sort_desc else pk > last).order_by(pk.desc() if sort_desc else pk).limit(page_size)
+        elif following is not None:
+            # previous page: walk back from the first key of the following one
+            first = following[0]
+            query = query.filter(pk > first if sort_desc else pk < first).order_by(pk if sort_desc else pk.desc()).limit(page_size)
+            reverse = True
+        else:
+            query = self._apply_pagination(query.order_by(pk.desc() if sort_desc else pk), page, page_size)
+        if not execute:
+            return count, query
+
+        rows = query.all()
+        if reverse:
+            rows.reverse()
+        if rows and page_size:
+            self._page_cursors[key + (page,)] = (rows[0].id, rows[-1].id)
+            self._page_cursors.move_to_end(key + (page,))
+            while len(self._page_cursors) > self.max_page_cursors:
+                self._page_cursors.popitem(last=False)
+        return count, rows
+
+class UserView(ScalableModelView):
+    column_list = ("id", "name", "username", "email", "is_active")
+
+class FavoriteView(ScalableModelView):
+    # the user column would lazy load one user per row
+    column_list = ("id", "user_id", "name", "nature", "nature_id")
+
+class CharacterView(ScalableModelView):
+    catalog_kind = "character"
+    column_list = ("id", "name", "gender", "birth_year", "height", "mass")
+
+class PlanetView(ScalableModelView):
+    catalog_kind = "planet"
+    column_list = ("id", "name", "terrain", "gravity", "diameter", "population")
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='Starwars API', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Favorite, db.session))
-    admin.add_view(ModelView(Character, db.session))
-    admin.add_view(ModelView(Planet, db.session))
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(FavoriteView(Favorite, db.session))
+    admin.add_view(CharacterView(Character, db.session))
+    admin.add_view(PlanetView(Planet, db.session))
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ScalableModelView(YourModelName, db.session))
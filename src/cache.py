@@ -0,0 +1,188 @@
+"""
+In-process read-through cache for the catalog (characters and planets).
+Responses are kept as serialized bytes, keyed by kind and request, and tied
+to a version counter stored in the `catalog_version` table. Writers bump the
+counter in their own transaction, so every worker drops its stale entries the
+next time it reads the version. With read replicas, versions and entries are
+kept per bind: a body read from a lagging replica is only ever stored under
+the version read from that same replica. Compressed copies of an entry are
+made on the first request that asks for that encoding and kept with it.
+ETags carry the version and a digest of the request key, so a validator of
+one URL never answers for another.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import request, Response, make_response
+from models import db, CatalogVersion
+from compression import negotiate, compress, mark_encoded
+from replicas import replica_router
+
+class CatalogCache:
+
+    def __init__(self, max_entries=1024, max_entry_bytes=8 * 1024 * 1024, version_ttl=1.0):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.version_ttl = version_ttl
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config.get("CATALOG_CACHE_MAX_ENTRIES", self.max_entries)
+        self.max_entry_bytes = app.config.get("CATALOG_CACHE_MAX_ENTRY_BYTES", self.max_entry_bytes)
+        self.version_ttl = app.config.get("CATALOG_CACHE_VERSION_TTL", self.version_ttl)
+        app.extensions["catalog_cache"] = self
+
+    ## VERSIONS ##
+
+    def scope(self):
+        # the replica this request reads from, None for the primary
+        return replica_router.current_bind()
+
+    def version(self, kind):
+        # the DB is read at most once every `version_ttl` seconds per worker and bind
+        now = time.monotonic()
+        version_key = (self.scope(), kind)
+        cached = self.versions.get(version_key)
+        if cached is not None and now - cached[1] < self.version_ttl:
+            return cached[0]
+        row = db.session.query(CatalogVersion.version).filter_by(name=kind).first()
+        version = row[0] if row else 0
+        self.versions[version_key] = (version, now)
+        return version
+
+    def bump(self, kind):
+        """
+        Increments the version of `kind` in the current transaction, the caller
+        commits it together with the catalog write.
+        """
+        updated = CatalogVersion.query.filter_by(name=kind).update(
+            {CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False
+        )
+        if not updated:
+            db.session.add(CatalogVersion(name=kind, version=1))
+        for version_key in [version_key for version_key in self.versions if version_key[1] == kind]:
+            self.versions.pop(version_key, None)
+
+    ## RESPONSES ##
+
+    def etag(self, kind, key, version):
+        digest = hashlib.sha1(str(key).encode("utf-8")).hexdigest()[:16]
+        return f"{kind}-v{version}-{digest}"
+
+    def respond(self, kind, key, build):
+        """
+        Serves `build()` through the cache. Only 200 responses are stored;
+        streamed bodies are captured while they are sent and dropped once they
+        grow past `max_entry_bytes`.
+        """
+        version = self.version(kind)
+        etag = self.etag(kind, key, version)
+        # weak comparison, compressed responses carry W/"<etag>"
+        if request.if_none_match.contains_weak(etag):
+            self.not_modified += 1
+            return self._not_modified(etag)
+
+        entry_key = (self.scope(), kind, key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(entry_key)
+                self.hits += 1
+                return self._from_entry(entry, etag)
+            self.misses += 1
+
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+        if response.is_streamed:
+            response.response = self._capture(response.response, entry_key, version, response.mimetype)
+        else:
+            entry = self._store(entry_key, version, response.get_data(), response.mimetype)
+            if entry is not None:
+                self._encode(response, entry)
+        return response
+
+    def get_entry(self, kind, key, version):
+        entry_key = (self.scope(), kind, key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def put_entry(self, kind, key, version, body, mimetype="application/json"):
+        self._store((self.scope(), kind, key), version, body, mimetype)
+
+    def _not_modified(self, etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    def _from_entry(self, entry, etag):
+        response = Response(entry[1], status=200, mimetype=entry[2])
+        response.set_etag(etag)
+        return self._encode(response, entry)
+
+    def _encode(self, response, entry):
+        encoding = negotiate(len(entry[1]))
+        if encoding is None:
+            return response
+        body = entry[3].get(encoding)
+        if body is None:
+            body = entry[3][encoding] = compress(entry[1], encoding)
+        response.set_data(body)
+        response.vary.add("Accept-Encoding")
+        mark_encoded(response, encoding)
+        return response
+
+    def _store(self, entry_key, version, body, mimetype):
+        if len(body) > self.max_entry_bytes:
+            return None
+        # (version, body, mimetype, {encoding: compressed body})
+        entry = (version, body, mimetype, {})
+        with self.lock:
+            self.entries[entry_key] = entry
+            self.entries.move_to_end(entry_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def _capture(self, iterable, entry_key, version, mimetype):
+        parts = []
+        size = 0
+        for chunk in iterable:
+            if parts is not None:
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                size += len(data)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(data)
+            yield chunk
+        if parts is not None:
+            self._store(entry_key, version, b"".join(parts), mimetype)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "entries": len(self.entries)
+        }
+
+catalog_cache = CatalogCache()
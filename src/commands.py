@@ -0,0 +1,89 @@
+"""
+`flask catalog ...` commands to load and dump characters and planets.
+
+    $ flask catalog import people.ndjson --kind character
+    $ flask catalog export --kind planet --format csv --output planets.csv
+    $ flask favorites rebuild-counts
+"""
+import csv
+import json
+import sys
+import click
+from flask.cli import AppGroup
+from models import db, Character, Planet, FavoriteCount
+from cache import catalog_cache
+from export import encode_chunks
+
+CATALOG_MODELS = {"character": Character, "planet": Planet}
+
+catalog_cli = AppGroup("catalog", help="Bulk import and export of the catalog.")
+
+def detect_format(path, format):
+    if format:
+        return format
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+def read_records(stream, format):
+    # a generator, the file is never held in memory
+    if format == "csv":
+        for row in csv.DictReader(stream):
+            yield row
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise click.ClickException(f"line {number}: invalid JSON ({error})")
+
+@catalog_cli.command("import")
+@click.argument("file", type=click.Path(allow_dash=True))
+@click.option("--kind", type=click.Choice(sorted(CATALOG_MODELS)), required=True)
+@click.option("--format", "format", type=click.Choice(["ndjson", "csv"]), default=None, help="Guessed from the extension.")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option("--on-conflict", type=click.Choice(["update", "nothing"]), default="update", show_default=True)
+def import_command(file, kind, format, batch_size, on_conflict):
+    """Stream FILE (NDJSON or CSV, - for stdin) into the catalog."""
+    model = CATALOG_MODELS[kind]
+    format = detect_format(file, format)
+    stream = click.open_file(file, "r", encoding="utf-8")
+    try:
+        catalog_cache.bump(kind)
+        counts = model.bulk_upsert(read_records(stream, format), batch_size=batch_size, on_conflict=on_conflict)
+    finally:
+        stream.close()
+    click.echo(json.dumps(counts))
+
+@catalog_cli.command("export")
+@click.option("--kind", type=click.Choice(sorted(CATALOG_MODELS)), required=True)
+@click.option("--format", "format", type=click.Choice(["ndjson", "csv"]), default="ndjson", show_default=True)
+@click.option("--output", type=click.Path(allow_dash=True), default="-", help="File to write, stdout by default.")
+@click.option("--batch-size", type=int, default=5000, show_default=True)
+def export_command(kind, format, output, batch_size):
+    """Stream the catalog rows, in id order, to a file or stdout."""
+    model = CATALOG_MODELS[kind]
+    names = list(model.serialize_fields)
+    columns = [model.__table__.c[name] for name in names]
+    rows = db.session.query(*columns).order_by(model.id).yield_per(batch_size)
+    out = open(output, "w", encoding="utf-8", newline="") if output != "-" else sys.stdout
+    try:
+        for chunk in encode_chunks(format, names, rows, batch_size):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+favorites_cli = AppGroup("favorites", help="Maintenance of the favorite counters.")
+
+@favorites_cli.command("rebuild-counts")
+def rebuild_counts_command():
+    """Recount every (nature, nature_id) from the favorite table."""
+    try:
+        rows = FavoriteCount.rebuild()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    click.echo(json.dumps({"counters": rows}))
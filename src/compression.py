@@ -0,0 +1,102 @@
+"""
+Negotiated response compression.
+
+    @api.route('/characters')
+    @compressed
+    def getCharacters(): ...
+
+    COMPRESSION_ENABLED=true
+    COMPRESSION_MIN_SIZE=1024       smaller bodies are sent as they are
+    COMPRESSION_LEVEL=6             gzip level, 1-9
+    COMPRESSION_BROTLI_LEVEL=4      brotli quality, 0-11
+
+`br` is offered when the optional `brotli` package is installed, `gzip`
+otherwise. Streamed bodies are compressed chunk by chunk whatever their size.
+Responses that already carry a Content-Encoding (the gzip exports, catalog
+cache hits) are left alone. The ETag of a compressed response is made weak,
+like nginx does, since the bytes differ from the identity representation.
+"""
+import gzip
+import zlib
+from functools import wraps
+from flask import current_app, make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate(size=None):
+    """
+    The encoding to send a body of `size` bytes with, None for identity.
+    """
+    config = current_app.config
+    if not config.get("COMPRESSION_ENABLED", True):
+        return None
+    if size is not None and size < config.get("COMPRESSION_MIN_SIZE", 1024):
+        return None
+    return request.accept_encodings.best_match(ENCODINGS)
+
+def compress(body, encoding):
+    config = current_app.config
+    if encoding == "br":
+        return brotli.compress(body, quality=config.get("COMPRESSION_BROTLI_LEVEL", 4))
+    # mtime=0 so the same body always compresses to the same bytes
+    return gzip.compress(body, config.get("COMPRESSION_LEVEL", 6), mtime=0)
+
+def compress_chunks(chunks, encoding, gzip_level=6, brotli_level=4):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=brotli_level)
+        finish = compressor.finish
+        compress_chunk = compressor.process
+    else:
+        compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        finish = compressor.flush
+        compress_chunk = compressor.compress
+    for chunk in chunks:
+        data = compress_chunk(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield finish()
+
+def mark_encoded(response, encoding):
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+def compress_response(response):
+    response = make_response(response)
+    if response.status_code != 200 or response.direct_passthrough:
+        return response
+    response.vary.add("Accept-Encoding")
+    if "Content-Encoding" in response.headers:
+        return response
+    if response.is_streamed:
+        encoding = negotiate()
+        if encoding is None:
+            return response
+        config = current_app.config
+        response.response = compress_chunks(
+            response.response, encoding, config.get("COMPRESSION_LEVEL", 6), config.get("COMPRESSION_BROTLI_LEVEL", 4)
+        )
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        encoding = negotiate(len(body))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+    mark_encoded(response, encoding)
+    return response
+
+def compressed(view):
+    """
+    Compresses the view's 200 responses for clients that accept it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return compress_response(view(*args, **kwargs))
+    return wrapper
@@ -0,0 +1,62 @@
+"""
+Engine options for SQLAlchemy, driven by environment variables:
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def env_bool(name, default, environ=os.environ):
+    value = environ.get(name, None)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+def backend_name(uri):
+    return make_url(uri).get_backend_name() if uri else None
+
+def engine_options(uri, environ=os.environ):
+    backend = backend_name(uri)
+    options = {"pool_pre_ping": env_bool("DB_POOL_PRE_PING", True, environ)}
+    if backend == "sqlite":
+        # sqlite uses its own single connection pools, sizing does not apply
+        return options
+
+    options.update(
+        pool_size=int(environ.get("DB_POOL_SIZE", 5)),
+        max_overflow=int(environ.get("DB_MAX_OVERFLOW", 10)),
+        pool_timeout=float(environ.get("DB_POOL_TIMEOUT", 30)),
+        # recycle before the server (or a failover proxy) drops idle connections
+        pool_recycle=int(environ.get("DB_POOL_RECYCLE", 1800))
+    )
+    statement_timeout = int(environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+    if statement_timeout and backend == "postgresql":
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+def install_statement_timeout(engine, statement_timeout):
+    # postgresql gets it through connect_args, mysql only through a session variable
+    if not statement_timeout or engine.dialect.name != "mysql":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION max_execution_time = {int(statement_timeout)}")
+        cursor.close()
+
+def init_engine(app, db):
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config.get("SQLALCHEMY_DATABASE_URI")))
+    if backend_name(app.config.get("SQLALCHEMY_DATABASE_URI")) == "mysql":
+        with app.app_context():
+            install_statement_timeout(db.engine, int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0)))
+
+def dispose_engine(app, db):
+    """
+    Called after gunicorn forks a worker: connections opened by the master
+    with `preload_app` must not be shared with the children.
+    """
+    with app.app_context():
+        db.engine.dispose()
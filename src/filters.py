@@ -0,0 +1,52 @@
+"""
+Whitelisted filtering and sorting for the catalog lists.
+
+    ?eye_color=blue&height_min=150&height_max=200&sort=-height
+
+Equality filters come from `model.filter_fields`, `<field>_min`/`<field>_max`
+ranges from `model.range_fields` and `sort` (prefix `-` for descending) from
+`model.sort_fields`. Every one of those columns is indexed.
+"""
+import math
+from flask import request
+from utils import APIException, check_db_int
+
+def convert_arg(column, name, value):
+    try:
+        value = column.type.python_type(value)
+    except (TypeError, ValueError):
+        raise APIException(f"'{name}' has an invalid value", status_code=400)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return check_db_int(name, value)
+    if isinstance(value, float) and not math.isfinite(value):
+        raise APIException(f"'{name}' has an invalid value", status_code=400)
+    return value
+
+def apply_filters(query, model):
+    for field in getattr(model, "filter_fields", ()):
+        value = request.args.get(field, None)
+        if value is not None:
+            column = getattr(model, field)
+            query = query.filter(column == convert_arg(column, field, value))
+    for field in getattr(model, "range_fields", ()):
+        column = getattr(model, field)
+        minimum = request.args.get(f"{field}_min", None)
+        maximum = request.args.get(f"{field}_max", None)
+        if minimum is not None:
+            query = query.filter(column >= convert_arg(column, f"{field}_min", minimum))
+        if maximum is not None:
+            query = query.filter(column <= convert_arg(column, f"{field}_max", maximum))
+    return query
+
+def get_sort(model):
+    """
+    Returns `(column, descending)`, sorting by id when `sort` is not given.
+    """
+    value = request.args.get("sort", None)
+    if value is None or value == "":
+        return model.id, False
+    descending = value.startswith("-")
+    field = value.lstrip("-")
+    if field not in getattr(model, "sort_fields", ("id",)):
+        raise APIException(f"Cannot sort by '{field}'", status_code=400, payload={"allowed": list(getattr(model, "sort_fields", ("id",)))})
+    return getattr(model, field), descending
@@ -1,44 +1,123 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
+
+`create_app(config)` builds the app; the admin, the SWAPI population routes,
+the sitemap and Flask-Migrate can be switched off with ADMIN_ENABLED,
+POPULATION_ENABLED, SITEMAP_ENABLED and MIGRATE_ENABLED (on by default under
+the `flask` command only), and what they need is only imported when enabled.
 """
 import os
-import requests
-from flask import Flask, request, jsonify, url_for
-from datetime import timedelta
-from flask_migrate import Migrate
-from flask_swagger import swagger
+import json
+from flask import Flask, Blueprint, request, jsonify, current_app, Response
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Character, Planet, Favorite
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, JWTManager
+from utils import APIException, generate_sitemap, list_response, get_id_list_arg, get_int_arg, DbIntConverter
+from models import db, User, Character, Planet, Favorite, FavoriteCount
+from cache import catalog_cache
+from database import init_engine, env_bool
+import metrics
+from query_budget import query_budget
+from commands import catalog_cli, favorites_cli
+from projection import get_fields_arg, projection
+from filters import apply_filters, get_sort
+from export import export_response
+from revocation import token_blocklist
+from replicas import replica_router, read_replica
+from compression import compressed
+from flask_jwt_extended import create_access_token, get_jwt, get_jwt_identity, jwt_required, JWTManager
 #from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DB_CONNECTION_STRING')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config["JWT_SECRET_KEY"] = os.environ.get("FLASK_APP_KEY")
-#app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(seconds=3600)
-MIGRATE = Migrate(app, db)
-jwt = JWTManager(app)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+api = Blueprint("api", __name__)
+population = Blueprint("population", __name__)
+jwt = JWTManager()
+
+def default_config(environ=os.environ):
+    return {
+        "SQLALCHEMY_DATABASE_URI": environ.get("DB_CONNECTION_STRING"),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "JWT_SECRET_KEY": environ.get("FLASK_APP_KEY"),
+        #"JWT_ACCESS_TOKEN_EXPIRES": timedelta(seconds=3600),
+        # flask_migrate pulls in alembic, only the `flask db` commands need it
+        "MIGRATE_ENABLED": env_bool("MIGRATE_ENABLED", environ.get("FLASK_RUN_FROM_CLI") == "true", environ),
+        "ADMIN_ENABLED": env_bool("ADMIN_ENABLED", True, environ),
+        "POPULATION_ENABLED": env_bool("POPULATION_ENABLED", True, environ),
+        "SITEMAP_ENABLED": env_bool("SITEMAP_ENABLED", True, environ),
+        "SWAPI_BASE_URL": environ.get("SWAPI_BASE_URL", "https://swapi.dev/api"),
+        "SWAPI_CONCURRENCY": int(environ.get("SWAPI_CONCURRENCY", 8)),
+        "SWAPI_RETRIES": int(environ.get("SWAPI_RETRIES", 3)),
+        "SWAPI_BACKOFF": float(environ.get("SWAPI_BACKOFF", 0.5)),
+        "SWAPI_TIMEOUT": float(environ.get("SWAPI_TIMEOUT", 10)),
+        "SWAPI_CACHE_BACKEND": environ.get("SWAPI_CACHE_BACKEND", None),
+        "SWAPI_CACHE_PATH": environ.get("SWAPI_CACHE_PATH", ".swapi-cache"),
+        "SWAPI_CACHE_TTL": float(environ.get("SWAPI_CACHE_TTL", 86400)),
+        "SWAPI_CACHE_MAX_BYTES": int(environ.get("SWAPI_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        "SWAPI_OFFLINE": env_bool("SWAPI_OFFLINE", False, environ),
+        "FAVORITES_BATCH_MAX": int(environ.get("FAVORITES_BATCH_MAX", 100)),
+        "FAVORITES_TOP_MAX": int(environ.get("FAVORITES_TOP_MAX", 100)),
+        "CATALOG_MULTIGET_MAX": int(environ.get("CATALOG_MULTIGET_MAX", 100)),
+        "EXPORT_GZIP_LEVEL": int(environ.get("EXPORT_GZIP_LEVEL", 6)),
+        "JWT_REVOCATION_ENABLED": env_bool("JWT_REVOCATION_ENABLED", True, environ),
+        "JWT_REVOCATION_REFRESH": float(environ.get("JWT_REVOCATION_REFRESH", 1.0)),
+        "DB_REPLICA_URLS": [url.strip() for url in environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()],
+        "DB_REPLICA_CHECK_INTERVAL": float(environ.get("DB_REPLICA_CHECK_INTERVAL", 5)),
+        "DB_REPLICA_RETRY": float(environ.get("DB_REPLICA_RETRY", 30)),
+        "DB_REPLICA_MAX_LAG": float(environ.get("DB_REPLICA_MAX_LAG", 0)),
+        "DB_REPLICA_STICKY": float(environ.get("DB_REPLICA_STICKY", 5)),
+        "COMPRESSION_ENABLED": env_bool("COMPRESSION_ENABLED", True, environ),
+        "COMPRESSION_MIN_SIZE": int(environ.get("COMPRESSION_MIN_SIZE", 1024)),
+        "COMPRESSION_LEVEL": int(environ.get("COMPRESSION_LEVEL", 6)),
+        "COMPRESSION_BROTLI_LEVEL": int(environ.get("COMPRESSION_BROTLI_LEVEL", 4))
+    }
+
+def create_app(config=None):
+    """
+    Builds the app from the environment, `config` overrides any key.
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.url_map.converters["int"] = DbIntConverter
+    app.config.update(default_config())
+    if config:
+        app.config.update(config)
+
+    jwt.init_app(app)
+    token_blocklist.init_app(app, jwt)
+    db.init_app(app)
+    init_engine(app, db)
+    replica_router.init_app(app, db)
+    catalog_cache.init_app(app)
+    metrics.init_app(app)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(favorites_cli)
+    CORS(app)
+    app.register_error_handler(APIException, handle_invalid_usage)
+
+    app.register_blueprint(api)
+    if app.config["POPULATION_ENABLED"]:
+        app.register_blueprint(population)
+    if app.config["SITEMAP_ENABLED"]:
+        app.add_url_rule("/", "sitemap", sitemap)
+    if app.config["MIGRATE_ENABLED"]:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if app.config["ADMIN_ENABLED"]:
+        from admin import setup_admin
+        setup_admin(app)
+    return app
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
-@app.route('/')
+@compressed
+@query_budget(0)
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
 ## LOGIN ##
 ###########
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
+@query_budget(1)
 def login():
     username = request.json.get("username", None)
     password = request.json.get("password", None)
@@ -57,17 +136,29 @@ def login():
         "token" : create_token
     })
 
+@api.route("/logout", methods=["POST"])
+@jwt_required()
+@query_budget(2)
+def logout():
+    token_blocklist.revoke_token(get_jwt())
+    db.session.commit()
+    return jsonify({"msg": "Token was successfully revoked."}), 200
+
 ## USERS ENDPOINT ##
 ####################
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def getUsers():
-    users = User.query.all()
-    request = list(map(lambda user:user.serialize(),users))    
-    return jsonify(request), 200
-
-@app.route("/users", methods=["POST"])
+    fields = get_fields_arg(User)
+    if fields:
+        query, serialize = projection(User, fields)
+        return list_response(query, User, serialize), 200
+    return list_response(User.query, User), 200
+
+@api.route("/users", methods=["POST"])
+@query_budget(2)
 def register_user():
     name = request.json.get("name", None)
     username = request.json.get("username", None)
@@ -98,271 +189,464 @@ def register_user():
         return jsonify({"msg": "User account was successfully created."}), 200
 
 #DELETE
-@app.route('/users', methods=["DELETE"])
+@api.route('/users', methods=["DELETE"])
 @jwt_required()
+@query_budget(6)
 def delete_user():
     current_user = get_jwt_identity()
-    userdel = User.query.get(current_user)
-    if userdel is None:
+    # the favorites go first, and leave the counters with them
+    favorites = Favorite.query.filter_by(user_id=current_user).with_entities(Favorite.nature, Favorite.nature_id).all()
+    if favorites:
+        Favorite.query.filter_by(user_id=current_user).delete(synchronize_session=False)
+        FavoriteCount.add([(row.nature, row.nature_id) for row in favorites], delta=-1)
+    # a bulk delete, session.delete() would load the favorites relationship
+    deleted = User.query.filter_by(id=current_user).delete(synchronize_session=False)
+    if not deleted:
+        db.session.rollback()
         return jsonify({"msg": "The user does not exist!."}), 404
-    db.session.delete(userdel)
+    # every token issued to the account so far stops working
+    token_blocklist.revoke_user(current_user)
     db.session.commit()
-    return jsonify({"Proccess completed by"}),200
+    return jsonify({"msg": "User was successfully deleted."}), 200
 
 ## CHARACTER ##
 ###############
 
-@app.route('/characters', methods=['GET'])
+def multiget_response(kind, model):
+    """
+    `?ids=1,5,9`: the rows come back in request order, ids that do not exist
+    as `{"id": .., "error": "not_found"}`. Rows already in the per-id cache
+    are reused and the rest are read with a single IN query.
+    """
+    ids = get_id_list_arg("ids", current_app.config.get("CATALOG_MULTIGET_MAX", 100))
+    fields = get_fields_arg(model)
+    found = {}
+    if fields:
+        query, serialize = projection(model, fields)
+        for row in query.filter(model.id.in_(set(ids))):
+            found[row.id] = json.dumps(serialize(row)).encode("utf-8")
+        return multiget_body(ids, found)
+
+    version = catalog_cache.version(kind)
+    for id in set(ids):
+        body = catalog_cache.get_entry(kind, id, version)
+        if body is not None:
+            found[id] = body.strip()
+    missing = set(ids) - set(found)
+    if missing:
+        for item in model.query.filter(model.id.in_(missing)):
+            body = json.dumps(item.serialize(), separators=(",", ":"), sort_keys=True).encode("utf-8")
+            catalog_cache.put_entry(kind, item.id, version, body)
+            found[item.id] = body
+    return multiget_body(ids, found)
+
+def multiget_body(ids, found):
+    parts = []
+    for id in ids:
+        if id in found:
+            parts.append(found[id])
+        else:
+            parts.append(json.dumps({"id": id, "error": "not_found"}).encode("utf-8"))
+    return Response(b"[" + b",".join(parts) + b"]", mimetype="application/json")
+
+def catalog_list_response(model):
+    fields = get_fields_arg(model)
+    sort = get_sort(model)
+    if fields:
+        query, serialize = projection(model, fields, extra=(sort[0].key,))
+        return list_response(apply_filters(query, model), model, serialize, sort)
+    return list_response(apply_filters(model.query, model), model, sort=sort)
+
+def catalog_item_response(model, id):
+    fields = get_fields_arg(model)
+    if fields:
+        query, serialize = projection(model, fields)
+        row = query.filter(model.id == id).first()
+        item = serialize(row) if row is not None else None
+    else:
+        row = model.query.filter_by(id=id).first()
+        item = row.serialize() if row is not None else None
+    if item is None:
+        return jsonify({"msg": f"The {model.__tablename__} does not exist!."}), 404
+    return jsonify(item)
+
+def catalog_export_response(model):
+    fields = get_fields_arg(model) or model.serialize_fields
+    columns = [model.__table__.c[name] for name in fields]
+    query = apply_filters(db.session.query(*columns), model).order_by(model.id)
+    return export_response(query, fields, model.__tablename__)
+
+def register_catalog_item(kind, model, label):
+    """
+    Validates the body with the model schema, every problem is reported at
+    once as `{"field", "error", "value"}`.
+    """
+    data = request.get_json(silent=True)
+    row, errors = model.schema().validate(data if isinstance(data, dict) else {})
+    if errors:
+        return jsonify({"msg": f"Please provide a valid {label}.", "errors": errors}), 400
+
+    if model.query.filter_by(name=row["name"]).first():
+        return jsonify({"msg": "User already exists."}), 401
+    db.session.add(model(**row))
+    catalog_cache.bump(kind)
+    db.session.commit()
+    return jsonify({"msg": "User account was successfully created."}), 200
+
+@api.route('/characters', methods=['GET'])
+@compressed
+@read_replica
+@query_budget(2)
 def getCharacters():
-    characters = Character.query.all()
-    request = list(map(lambda character:character.serialize(),characters))    
-    return jsonify(request), 200
+    if "ids" in request.args:
+        return catalog_cache.respond("character", request.full_path, lambda: multiget_response("character", Character))
+    return catalog_cache.respond("character", request.full_path, lambda: catalog_list_response(Character))
 
-@app.route('/characters/<int:character_id>', methods=['GET'])
+@api.route('/characters/<int:character_id>', methods=['GET'])
+@read_replica
+@query_budget(2)
 def getCharacter(character_id):
-    if character_id is None:
-        return jsonify({"msg": "The user does not exist!."}), 404
-    character = Character.query.filter_by(id=character_id).first()
-    request = character.serialize()
-    return jsonify(request), 200
+    key = request.full_path if "fields" in request.args else character_id
+    return catalog_cache.respond("character", key, lambda: catalog_item_response(Character, character_id))
 
-@app.route("/characters", methods=["POST"])
-def register_characters():
-    name = request.json.get("name", None)
-    birth_year = request.json.get("birth_year", None)
-    gender = request.json.get("gender", None)
-    height = request.json.get("height", None)
-    mass = request.json.get("mass", None)
-    skin_color = request.json.get("skin_color", None)
-    eye_color = request.json.get("eye_color", None)
-    hair_color = request.json.get("hair_color", None)
+@api.route('/characters/export', methods=['GET'])
+@query_budget(0)
+def export_characters():
+    return catalog_export_response(Character)
 
-    if name is None:
-        return jsonify({"msg": "Please provide a valid name."}), 400
-    if birth_year is None:
-        return jsonify({"msg": "Please provide a valid Birth Year."}), 400
-    if gender is None:
-        return jsonify({"msg": "Please provide a valid Gender."}), 400
-    if height is None:
-        return jsonify({"msg": "Please provide a valid Height."}), 400
-    if mass is None:
-        return jsonify({"msg": "Please provide a valid Mass."}), 400
-    if skin_color is None:
-        return jsonify({"msg": "Please provide a valid Skin Color."}), 400
-    if eye_color is None:
-        return jsonify({"msg": "Please provide a valid Eye Color."}), 400
-    if hair_color is None:
-        return jsonify({"msg": "Please provide a valid Hair Color."}), 400
-    
-    character = Character.query.filter_by(name=name).first()
-    if character:
-        return jsonify({"msg": "User already exists."}), 401
-    else:
-        new_character = Character()
-        new_character.name = name
-        new_character.birth_year = birth_year
-        new_character.gender = gender
-        new_character.height = height
-        new_character.mass = mass
-        new_character.skin_color = skin_color
-        new_character.eye_color = eye_color
-        new_character.hair_color = hair_color
-
-        db.session.add(new_character)
-        db.session.commit()
-        return jsonify({"msg": "User account was successfully created."}), 200
+@api.route("/characters", methods=["POST"])
+@query_budget(4)
+def register_characters():
+    return register_catalog_item("character", Character, "Character")
 
 ## PLANET ##
 ############
 
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
+@compressed
+@read_replica
+@query_budget(2)
 def getPlanets():
-    planets = Planet.query.all()
-    request = list(map(lambda planet:planet.serialize(),planets))    
-    return jsonify(request), 200
+    if "ids" in request.args:
+        return catalog_cache.respond("planet", request.full_path, lambda: multiget_response("planet", Planet))
+    return catalog_cache.respond("planet", request.full_path, lambda: catalog_list_response(Planet))
 
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+@api.route('/planets/<int:planet_id>', methods=['GET'])
+@read_replica
+@query_budget(2)
 def getplanet(planet_id):
-    if planet_id is None:
-        return jsonify({"msg": "The user does not exist!."}), 404
-    planet = Planet.query.filter_by(id=planet_id).first()
-    request = planet.serialize()
-    return jsonify(request), 200
+    key = request.full_path if "fields" in request.args else planet_id
+    return catalog_cache.respond("planet", key, lambda: catalog_item_response(Planet, planet_id))
+
+@api.route('/planets/export', methods=['GET'])
+@query_budget(0)
+def export_planets():
+    return catalog_export_response(Planet)
 
 # POST
-@app.route("/planets", methods=["POST"])
+@api.route("/planets", methods=["POST"])
+@query_budget(4)
 def register_planet():
-    name = request.json.get("name", None)
-    rotation_period = request.json.get("rotation_period", None)
-    orbital_period = request.json.get("orbital_period", None)
-    diameter = request.json.get("diameter", None)
-    climate = request.json.get("climate", None)
-    gravity = request.json.get("gravity", None)
-    terrain = request.json.get("terrain", None)
-    surface_water = request.json.get("surface_water", None)
-    population = request.json.get("population", None)
-    
-    
-    if name is None:
-        return jsonify({"msg": "Please provide a valid name."}), 400
-    if rotation_period is None:
-        return jsonify({"msg": "Please provide a valid Rotation Period."}), 400
-    if orbital_period is None:
-        return jsonify({"msg": "Please provide a valid Orbital Period."}), 400
-    if diameter is None:
-        return jsonify({"msg": "Please provide a valid Diameter."}), 400
-    if climate is None:
-        return jsonify({"msg": "Please provide a valid Climate."}), 400
-    if gravity is None:
-        return jsonify({"msg": "Please provide a valid Gravity."}), 400
-    if terrain is None:
-        return jsonify({"msg": "Please provide a valid Terrain."}), 400
-    if surface_water is None:
-        return jsonify({"msg": "Please provide a valid Surface Water."}), 400
-    if population is None:
-        return jsonify({"msg": "Please provide a valid Population."}), 400
-    
-    planet = Planet.query.filter_by(name=name).first()
-    if planet:
-        return jsonify({"msg": "User already exists."}), 401
-    else:
-        new_planet = Planet()
-        new_planet.name = name
-        new_planet.rotation_period = rotation_period
-        new_planet.orbital_period = orbital_period
-        new_planet.diameter = diameter
-        new_planet.climate = climate
-        new_planet.gravity = gravity
-        new_planet.terrain = terrain
-        new_planet.surface_water = surface_water
-        new_planet.population = population
-
-        db.session.add(new_planet)
-        db.session.commit()
-        return jsonify({"msg": "User account was successfully created."}), 200
+    return register_catalog_item("planet", Planet, "Planet")
 
 ## FAVORITE ##
 ##############
 
-@app.route('/users/favorites', methods=['GET'])
+@api.route('/users/favorites', methods=['GET'])
+@compressed
 @jwt_required()
+@query_budget(1)
 def getFavorites():
+    # on the primary: API clients send no sticky cookie and must see the favorites they just added
     current_user = get_jwt_identity()
+    if request.args.get("expand") in ("1", "true"):
+        return jsonify(expanded_favorites(current_user)), 200
+    fields = get_fields_arg(Favorite)
+    if fields:
+        query, serialize = projection(Favorite, fields)
+        return jsonify(list(map(serialize, query.filter(Favorite.user_id == current_user)))), 200
     favorites = Favorite.query.filter_by(user_id=current_user).all()
     all_favorites = list(map(lambda all:all.serialize(),favorites))  
     return jsonify(all_favorites), 200
 
-@app.route('/favorite/character/<int:character_id>', methods=["POST"])
+def expanded_favorites(user_id):
+    # a single query, the catalog rows come in through two outer joins
+    rows = db.session.query(Favorite, Character, Planet).filter(Favorite.user_id == user_id).outerjoin(
+        Character, db.and_(Favorite.nature == 'character', Character.id == Favorite.nature_id)
+    ).outerjoin(
+        Planet, db.and_(Favorite.nature == 'planet', Planet.id == Favorite.nature_id)
+    ).order_by(Favorite.id)
+
+    all_favorites = []
+    for favorite, character, planet in rows:
+        item = character or planet
+        serialized = favorite.serialize()
+        serialized[favorite.nature] = item.serialize() if item is not None else None
+        all_favorites.append(serialized)
+    return all_favorites
+
+@api.route('/users/favorites/export', methods=['GET'])
+@jwt_required()
+@query_budget(0)
+def export_favorites():
+    current_user = get_jwt_identity()
+    fields = get_fields_arg(Favorite) or Favorite.serialize_fields
+    columns = [Favorite.__table__.c[name] for name in fields]
+    query = db.session.query(*columns).filter(Favorite.user_id == current_user).order_by(Favorite.id)
+    return export_response(query, fields, "favorites")
+
+@api.route('/favorite/character/<int:character_id>', methods=["POST"])
 @jwt_required()
+@query_budget(3)
 def favorite_character(character_id):
     body = request.json
     if character_id is None:
         return jsonify({"msg": "Please provide a valid Character."}), 400
-    fav_character = Favorite.query.filter_by(nature_id=character_id, nature='character').first()
+    current_user = get_jwt_identity()
+    fav_character = Favorite.lookup(current_user, 'character', character_id).with_entities(Favorite.id).first()
     if fav_character:
         return jsonify({"msg": "User already exists."}), 401
     else:
-        current_user = get_jwt_identity()
         new_favorite = Favorite(
                 name = body["name"],
                 nature = 'character' ,
-                nature_id = body["nature_id"],
+                nature_id = character_id,
                 user_id = current_user
         )
         db.session.add(new_favorite)
+        FavoriteCount.add([('character', character_id)])
         db.session.commit()
         return jsonify({"msg": "Favorite was successfully created."}), 200
 
-@app.route('/favorite/planet/<int:planet_id>', methods=["POST"])
+@api.route('/favorite/planet/<int:planet_id>', methods=["POST"])
 @jwt_required()
+@query_budget(3)
 def favorite_planet(planet_id):
     body = request.json   
     if planet_id is None:
         return jsonify({"msg": "Please provide a valid Planet."}), 400
-    fav_planet = Favorite.query.filter_by(nature_id=planet_id, nature='planet').first()
+    current_user = get_jwt_identity()
+    fav_planet = Favorite.lookup(current_user, 'planet', planet_id).with_entities(Favorite.id).first()
     if fav_planet:
         return jsonify({"msg": "User already exists."}), 401
     else:
-        current_user = get_jwt_identity()
         new_favorite = Favorite(
                 name = body["name"],
                 nature = 'planet' ,
-                nature_id = body["nature_id"],
+                nature_id = planet_id,
                 user_id = current_user
         )
         db.session.add(new_favorite)
+        FavoriteCount.add([('planet', planet_id)])
         db.session.commit()
         return jsonify({"msg": "Favorite was successfully created."}), 200
 
-@app.route('/favorite/character/<int:nature_id>', methods=["DELETE"])
+@api.route('/favorite/character/<int:nature_id>', methods=["DELETE"])
 @jwt_required()
+@query_budget(2)
 def favorite_character_delete(nature_id):   
     if nature_id is None:
         return jsonify({"msg": "Please provide a valid Character."}), 400
     current_user = get_jwt_identity()
-    del_character = Favorite.query.filter_by(nature_id=nature_id, user_id=current_user, nature = 'character').first()
-    if del_character is None:
+    deleted = Favorite.lookup(current_user, 'character', nature_id).delete(synchronize_session=False)
+    if not deleted:
         return jsonify({"msg": "The Favorite Character does not exist!."}), 401
-    db.session.delete(del_character)
+    FavoriteCount.add([('character', nature_id)], delta=-1)
     db.session.commit()
     return jsonify({"msg": "Favorite was successfully delete."}), 200
 
-@app.route('/favorite/planet/<int:nature_id>', methods=["DELETE"])
+@api.route('/favorite/planet/<int:nature_id>', methods=["DELETE"])
 @jwt_required()
+@query_budget(2)
 def favorite_planet_delete(nature_id):   
     if nature_id is None:
         return jsonify({"msg": "Please provide a valid Planet."}), 400
     current_user = get_jwt_identity()
-    del_planet = Favorite.query.filter_by(nature_id=nature_id, user_id=current_user).first()
-    if del_planet is None:
-        return jsonify({"msg": "The Favorite Character does not exist!."}), 401
-    db.session.delete(del_planet)
+    deleted = Favorite.lookup(current_user, 'planet', nature_id).delete(synchronize_session=False)
+    if not deleted:
+        return jsonify({"msg": "The Favorite Planet does not exist!."}), 401
+    FavoriteCount.add([('planet', nature_id)], delta=-1)
     db.session.commit()
     return jsonify({"msg": "Favorite was successfully delete."}), 200
 
-## MIGRATE DATABASE ##
+## FAVORITES BATCH ##
+#####################
+
+FAVORITE_NATURES = {"character": Character, "planet": Planet}
+
+def parse_favorite_items(body):
+    items = body.get("favorites") if isinstance(body, dict) else body
+    if not isinstance(items, list) or len(items) == 0:
+        raise APIException("You need to specify a non empty list of favorites", status_code=400)
+    max_items = current_app.config.get("FAVORITES_BATCH_MAX", 100)
+    if len(items) > max_items:
+        raise APIException(f"You can send at most {max_items} favorites per batch", status_code=400)
+
+    parsed = []
+    for item in items:
+        nature = item.get("nature") if isinstance(item, dict) else None
+        nature_id = item.get("nature_id") if isinstance(item, dict) else None
+        if nature not in FAVORITE_NATURES or not isinstance(nature_id, int) or isinstance(nature_id, bool):
+            raise APIException("Every favorite needs a nature ('character' or 'planet') and an integer nature_id", status_code=400, payload={"item": item})
+        parsed.append((nature, nature_id))
+    return parsed
+
+def favorite_pairs(items):
+    # matches every (nature, nature_id) pair of the batch in a single clause
+    clauses = []
+    for nature in FAVORITE_NATURES:
+        ids = {nature_id for item_nature, nature_id in items if item_nature == nature}
+        if ids:
+            clauses.append(db.and_(Favorite.nature == nature, Favorite.nature_id.in_(ids)))
+    return db.or_(*clauses)
+
+@api.route('/users/favorites/batch', methods=['POST'])
+@jwt_required()
+@query_budget(5)
+def favorites_batch_add():
+    current_user = get_jwt_identity()
+    items = parse_favorite_items(request.get_json(silent=True))
+
+    names = {}
+    for nature, model in FAVORITE_NATURES.items():
+        ids = {nature_id for item_nature, nature_id in items if item_nature == nature}
+        if ids:
+            for row in db.session.query(model.id, model.name).filter(model.id.in_(ids)):
+                names[(nature, row.id)] = row.name
+
+    existing = set()
+    taken_names = set()
+    query = Favorite.query.filter(
+        Favorite.user_id == current_user,
+        db.or_(favorite_pairs(items), Favorite.name.in_(set(names.values())))
+    )
+    for favorite in query.with_entities(Favorite.nature, Favorite.nature_id, Favorite.name):
+        existing.add((favorite.nature, favorite.nature_id))
+        taken_names.add(favorite.name)
+
+    results = []
+    new_favorites = []
+    for nature, nature_id in items:
+        name = names.get((nature, nature_id))
+        if name is None:
+            status = "not_found"
+        elif (nature, nature_id) in existing:
+            status = "exists"
+        elif name in taken_names:
+            status = "conflict"
+        else:
+            status = "created"
+            existing.add((nature, nature_id))
+            taken_names.add(name)
+            new_favorites.append({"user_id": current_user, "name": name, "nature": nature, "nature_id": nature_id})
+        results.append({"nature": nature, "nature_id": nature_id, "status": status})
+
+    if new_favorites:
+        db.session.execute(Favorite.__table__.insert(), new_favorites)
+        FavoriteCount.add([(favorite["nature"], favorite["nature_id"]) for favorite in new_favorites])
+    db.session.commit()
+    return jsonify({"created": len(new_favorites), "results": results}), 200
+
+@api.route('/users/favorites/batch', methods=['DELETE'])
+@jwt_required()
+@query_budget(3)
+def favorites_batch_delete():
+    current_user = get_jwt_identity()
+    items = parse_favorite_items(request.get_json(silent=True))
+
+    query = Favorite.query.filter(Favorite.user_id == current_user, favorite_pairs(items))
+    found = {(row.nature, row.nature_id): row.id for row in query.with_entities(Favorite.id, Favorite.nature, Favorite.nature_id)}
+    if found:
+        Favorite.query.filter(Favorite.id.in_(found.values())).delete(synchronize_session=False)
+        FavoriteCount.add(found.keys(), delta=-1)
+    db.session.commit()
+
+    results = []
+    for nature, nature_id in items:
+        status = "deleted" if (nature, nature_id) in found else "not_found"
+        results.append({"nature": nature, "nature_id": nature_id, "status": status})
+    return jsonify({"deleted": len(found), "results": results}), 200
+
+## FAVORITE STATS ##
 ######################
 
-BASE_URL = "https://swapi.dev/api"
-@app.route('/population/characters', methods=['POST'])
-def population_character():
-    #Solicitud de las caracteristicas
-    response = requests.get(f"{BASE_URL}/{'people'}/")
-    response = response.json()
-    all_results = []
+def get_nature_arg(nature):
+    if nature not in FAVORITE_NATURES:
+        raise APIException(f"Unknown nature '{nature}'", status_code=400, payload={"allowed": list(FAVORITE_NATURES)})
+    return nature
+
+@api.route('/stats/favorites/top', methods=['GET'])
+@read_replica
+@query_budget(1)
+def favorites_top():
+    """
+    The most favorited characters or planets, read from the counters through
+    the (nature, count, nature_id) index, never from the favorite table.
+    """
+    nature = get_nature_arg(request.args.get("nature", "character"))
+    limit = get_int_arg("limit", 10, minimum=1, maximum=current_app.config.get("FAVORITES_TOP_MAX", 100))
+    model = FAVORITE_NATURES[nature]
+    rows = db.session.query(FavoriteCount.nature_id, FavoriteCount.count, model.name).outerjoin(
+        model, model.id == FavoriteCount.nature_id
+    ).filter(
+        FavoriteCount.nature == nature, FavoriteCount.count > 0
+    ).order_by(FavoriteCount.count.desc(), FavoriteCount.nature_id.desc()).limit(limit)
+    results = [{"nature_id": row.nature_id, "name": row.name, "count": row.count} for row in rows]
+    return jsonify({"nature": nature, "results": results}), 200
+
+@api.route('/stats/favorites/<nature>/<int:nature_id>', methods=['GET'])
+@read_replica
+@query_budget(1)
+def favorite_count(nature, nature_id):
+    nature = get_nature_arg(nature)
+    count = db.session.query(FavoriteCount.count).filter_by(nature=nature, nature_id=nature_id).scalar()
+    return jsonify({"nature": nature, "nature_id": nature_id, "count": count or 0}), 200
+
+## CACHE ##
+#############
+
+@api.route('/stats/cache', methods=['GET'])
+@query_budget(0)
+def cache_stats():
+    return jsonify(catalog_cache.stats()), 200
 
-    for result in response['results']:
-        detail = requests.get(result['url'])
-        detail = detail.json()
-        all_results.append(detail)
+## MIGRATE DATABASE ##
+######################
 
-    instances = []
+POPULATION_MODES = ("incremental", "full")
+
+def populate(kind, model, resource):
+    """
+    `?mode=incremental` (default) syncs from the listing pages alone and
+    writes only new or changed records; `?mode=full` fetches every detail
+    page and upserts everything.
+    """
+    mode = request.args.get("mode", "incremental")
+    if mode not in POPULATION_MODES:
+        raise APIException(f"Unknown mode '{mode}'", status_code=400, payload={"allowed": list(POPULATION_MODES)})
+    from swapi import SwapiClient
+    with SwapiClient.from_config(current_app.config) as client:
+        if mode == "full":
+            all_results = client.fetch_resource(resource)
+            catalog_cache.bump(kind)
+            return dict(model.bulk_upsert(all_results), mode=mode)
+        summary = model.sync_records(client.iter_listing(resource))
+    if summary["inserted"] or summary["updated"]:
+        catalog_cache.bump(kind)
+    db.session.commit()
+    return dict(summary, mode=mode)
 
-    for character in all_results:
-        instance = Character.create(character)
-        instances.append(instance)
-    return jsonify(list(map(lambda inst: inst.serialize(), instances))), 200
+@population.route('/population/characters', methods=['POST'])
+@query_budget(6)
+def population_character():
+    return jsonify(populate("character", Character, "people")), 200
 
-URL_BASE = "https://swapi.dev/api"
-@app.route('/population/planets', methods=['POST'])
+@population.route('/population/planets', methods=['POST'])
+@query_budget(6)
 def handle_characters():
-    response = requests.get(f"{URL_BASE}/{'planets'}/",)
-    response = response.json()
-    all_results = []
-
-    for result in response['results']:
-        detail = requests.get(result['url'])
-        detail = detail.json()
-        all_results.append(detail)
-    
-    instances = []  
-
-    for planet in all_results:
-        instance = Planet.create(planet)
-        instances.append(instance)
-    return jsonify(list(map(lambda inst: inst.serialize(), instances))), 200
+    return jsonify(populate("planet", Planet, "planets")), 200
 
 # this only runs if `$ python src/main.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
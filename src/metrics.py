@@ -0,0 +1,136 @@
+"""
+Prometheus instrumentation: request latency per route and status, requests in
+flight, SQL statements and time per request, and SWAPI fetch timings, exposed
+at `/metrics`.
+
+Under gunicorn set `PROMETHEUS_MULTIPROC_DIR` to an empty writable directory
+so every worker writes its samples there and `/metrics` aggregates them.
+`prometheus_client` is optional; without it the hooks are no-ops.
+"""
+import os
+import time
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, multiprocess
+except ImportError:
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds", "Request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+    )
+    REQUESTS_IN_PROGRESS = Gauge(
+        "http_requests_in_progress", "Requests being served", ["method", "route"], multiprocess_mode="livesum"
+    )
+    REQUEST_QUERIES = Histogram(
+        "http_request_db_queries", "SQL statements per request", ["route"], buckets=QUERY_BUCKETS
+    )
+    REQUEST_DB_TIME = Histogram(
+        "http_request_db_seconds", "Time spent in SQL per request", ["route"], buckets=LATENCY_BUCKETS
+    )
+    DB_QUERIES = Counter("db_queries_total", "SQL statements executed")
+    SWAPI_FETCH_LATENCY = Histogram(
+        "swapi_fetch_duration_seconds", "SWAPI fetch latency", ["kind", "outcome"], buckets=LATENCY_BUCKETS
+    )
+
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def observe_swapi(kind, seconds, outcome="ok"):
+    if prometheus_client is not None:
+        SWAPI_FETCH_LATENCY.labels(kind, outcome).observe(seconds)
+
+class RequestMetrics:
+    __slots__ = ("method", "route", "start", "queries", "db_time", "done")
+
+    def __init__(self, method, route):
+        self.method = method
+        self.route = route
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.done = False
+
+    def finish(self, status):
+        if self.done:
+            return
+        self.done = True
+        REQUESTS_IN_PROGRESS.labels(self.method, self.route).dec()
+        REQUEST_LATENCY.labels(self.method, self.route, str(status)).observe(time.perf_counter() - self.start)
+        REQUEST_QUERIES.labels(self.route).observe(self.queries)
+        REQUEST_DB_TIME.labels(self.route).observe(self.db_time)
+
+## SQL ##
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if prometheus_client is not None:
+        DB_QUERIES.inc()
+    if has_request_context() and g.get("metrics") is not None:
+        g.metrics.queries += 1
+        g.metrics.db_time += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_query_start"):
+        connection.info["metrics_query_start"].pop()
+
+## REQUESTS ##
+
+def _before_request():
+    g.metrics = RequestMetrics(request.method, route_label())
+    REQUESTS_IN_PROGRESS.labels(g.metrics.method, g.metrics.route).inc()
+
+def _after_request(response):
+    state = g.get("metrics")
+    if state is None:
+        return response
+    if response.is_streamed:
+        # the body (and its queries) is produced after this hook, finish on close
+        response.call_on_close(lambda: state.finish(response.status_code))
+    else:
+        state.finish(response.status_code)
+    return response
+
+def _teardown_request(error):
+    # unhandled exceptions skip after_request, they end up as a 500
+    if error is not None and g.get("metrics") is not None:
+        g.metrics.finish(500)
+
+def metrics_view():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    if prometheus_client is None:
+        app.logger.warning("prometheus_client is not installed, /metrics is disabled")
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+
+def mark_process_dead(pid):
+    # called from gunicorn's child_exit hook
+    if prometheus_client is not None and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
@@ -1,7 +1,276 @@
-from flask_sqlalchemy import SQLAlchemy
+import hashlib
+import json
+from datetime import datetime
 from sqlalchemy.orm import backref
+from sqlalchemy import bindparam
+from schema import ModelSchema
+from replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+# a flask_sqlalchemy.SQLAlchemy whose session can send reads to a replica
+db = RoutingSQLAlchemy()
+
+## BULK UPSERT ##
+#################
+
+def _dialect_insert(dialect_name):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        return None
+    return insert
+
+class BulkUpsertMixin:
+    # unique column used to detect existing rows
+    upsert_key = "name"
+
+    # filled from the SWAPI record instead of a column of the same name
+    source_fields = ("source_url", "edited", "content_hash")
+
+    # validation errors kept in a summary, the rest are only counted as skipped
+    max_reported_errors = 20
+
+    ## SCHEMA ##
+
+    @classmethod
+    def schema(cls):
+        """
+        The record schema, compiled from the table on first use: every column
+        but the primary key and the source fields.
+        """
+        schema = cls.__dict__.get("_schema", None)
+        if schema is None:
+            schema = cls._schema = ModelSchema(cls.__table__, exclude=cls.source_fields)
+        return schema
+
+    @classmethod
+    def coerce(cls, data):
+        row = cls.schema().coerce(data)
+        for name in cls.source_fields:
+            if name in data:
+                row[name] = data[name]
+        return row
+
+    @classmethod
+    def validate_records(cls, records):
+        """
+        Validates a batch of SWAPI records. Returns the rows ready to write and
+        the failures, `{"index": .., "errors": [...]}`.
+        """
+        rows, failures = cls.schema().validate_many(records)
+        failed = {failure["index"] for failure in failures}
+        valid = (data for index, data in enumerate(records) if index not in failed)
+        return [cls.with_source(row, data) for row, data in zip(rows, valid)], failures
+
+    @classmethod
+    def _report_failures(cls, batch, failures, summary):
+        summary["skipped"] += len(failures)
+        room = max(cls.max_reported_errors - len(summary["errors"]), 0)
+        for failure in failures[:room]:
+            data = batch[failure["index"]]
+            summary["errors"].append({"record": data.get("url", None) or data.get("name", None), "errors": failure["errors"]})
+
+    @classmethod
+    def with_source(cls, row, data):
+        """
+        Adds the SWAPI url, the `edited` timestamp and a hash of the catalog
+        fields, so a later sync can tell unchanged records apart. A record
+        without a url gets None, which is never written over a stored url.
+        """
+        row["source_url"] = data.get("url", None)
+        row["edited"] = parse_edited(data.get("edited", None))
+        row["content_hash"] = content_hash(row, cls.serialize_fields)
+        return row
+
+    @classmethod
+    def bulk_upsert(cls, records, batch_size=500, on_conflict="update"):
+        """
+        Inserts `records` in batches, one executemany insert and one
+        executemany update per batch and a single commit at the end. Records
+        are matched with the stored rows by source url, then by `upsert_key`,
+        so a record renamed upstream updates its row. Existing rows are
+        updated (`on_conflict="update"`) or left alone (`"nothing"`).
+        Returns the inserted/updated/skipped counts and the first validation
+        errors.
+        """
+        counts = {"inserted": 0, "updated": 0, "skipped": 0, "errors": []}
+        batch = []
+        try:
+            for data in records:
+                batch.append(data)
+                if len(batch) >= batch_size:
+                    cls._upsert_batch(batch, on_conflict, counts)
+                    batch = []
+            if batch:
+                cls._upsert_batch(batch, on_conflict, counts)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return counts
+
+    @classmethod
+    def _upsert_batch(cls, batch, on_conflict, counts):
+        table = cls.__table__
+
+        valid, failures = cls.validate_records(batch)
+        cls._report_failures(batch, failures, counts)
+        rows = {}
+        for row in valid:
+            if row[cls.upsert_key] in rows:
+                counts["skipped"] += 1
+            rows[row[cls.upsert_key]] = row
+        if not rows:
+            return
+
+        matches = cls._match_existing(rows)
+        new_rows = [row for name, row in rows.items() if matches[name] is None]
+        old_rows = [(matches[name].id, row) for name, row in rows.items() if matches[name] is not None]
+        if on_conflict != "update":
+            counts["skipped"] += len(old_rows)
+            old_rows = []
+
+        dialect_name = db.engine.dialect.name
+        insert = _dialect_insert(dialect_name)
+        columns = [column.name for column in table.columns if not column.primary_key]
+        insert_rows = [dict({name: None for name in columns}, **row) for row in new_rows]
+        if insert is not None and insert_rows:
+            # executemany of one cached statement, large VALUES lists are slow to compile;
+            # a row another import inserted meanwhile is still updated or left alone
+            stmt = insert(table)
+            if dialect_name == "mysql":
+                if on_conflict == "update":
+                    stmt = stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in columns})
+                else:
+                    stmt = stmt.prefix_with("IGNORE")
+            elif on_conflict == "update":
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[cls.upsert_key],
+                    set_={name: stmt.excluded[name] for name in columns if name != cls.upsert_key}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[cls.upsert_key])
+            db.session.execute(stmt, insert_rows)
+        elif insert_rows:
+            # executemany fallback for dialects without an upsert construct
+            db.session.execute(table.insert(), insert_rows)
+        if old_rows:
+            cls._update_by_id(old_rows)
+
+        counts["inserted"] += len(new_rows)
+        counts["updated"] += len(old_rows)
+
+    @classmethod
+    def _match_existing(cls, rows, *columns):
+        """
+        The stored row of each record of `rows` (keyed by `upsert_key`),
+        matched by source url first and then by key: (id, key, source_url,
+        *columns), or None.
+        """
+        table = cls.__table__
+        key = table.c[cls.upsert_key]
+        urls = [row["source_url"] for row in rows.values() if row["source_url"]]
+        by_url, by_key = {}, {}
+        query = db.session.query(table.c.id, key, table.c.source_url, *columns).filter(
+            db.or_(key.in_(list(rows)), table.c.source_url.in_(urls))
+        )
+        for existing in query:
+            by_key[existing[1]] = existing
+            if existing.source_url:
+                by_url[existing.source_url] = existing
+        return {name: by_url.get(row["source_url"]) or by_key.get(name) for name, row in rows.items()}
+
+    @classmethod
+    def _update_by_id(cls, rows):
+        # `rows` are (id, row) pairs; a record without a url keeps the stored one
+        table = cls.__table__
+        columns = [column.name for column in table.columns if not column.primary_key]
+        values = {name: bindparam("_" + name) for name in columns}
+        values["source_url"] = db.func.coalesce(bindparam("_source_url"), table.c.source_url)
+        stmt = table.update().where(table.c.id == bindparam("_id")).values(values)
+        db.session.execute(stmt, [
+            dict({"_" + name: row.get(name) for name in columns}, _id=id) for id, row in rows
+        ])
+
+    ## INCREMENTAL SYNC ##
+
+    @classmethod
+    def sync_records(cls, records, batch_size=500):
+        """
+        Writes only what changed: records are matched with the stored rows by
+        source url (or name) and compared by content hash. Unchanged rows cost
+        one read per batch and no writes. The caller commits.
+        Returns the counts, the names that were inserted or updated and the
+        first validation errors.
+        """
+        summary = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "missing": 0,
+                   "changes": {"inserted": [], "updated": []}, "errors": []}
+        seen_urls = set()
+        batch = []
+        for data in records:
+            batch.append(data)
+            if len(batch) >= batch_size:
+                cls._sync_batch(batch, summary, seen_urls)
+                batch = []
+        if batch:
+            cls._sync_batch(batch, summary, seen_urls)
+        # rows synced before that the source no longer lists, they are kept
+        known = db.session.query(cls.source_url).filter(cls.source_url.isnot(None))
+        summary["missing"] = sum(1 for (url,) in known if url not in seen_urls)
+        return summary
+
+    @classmethod
+    def _sync_batch(cls, batch, summary, seen_urls):
+        table = cls.__table__
+        valid, failures = cls.validate_records(batch)
+        cls._report_failures(batch, failures, summary)
+        rows = {}
+        for row in valid:
+            if row[cls.upsert_key] in rows:
+                summary["skipped"] += 1
+                continue
+            rows[row[cls.upsert_key]] = row
+            if row["source_url"]:
+                seen_urls.add(row["source_url"])
+        if not rows:
+            return
+
+        matches = cls._match_existing(rows, table.c.content_hash)
+        columns = [column.name for column in table.columns if not column.primary_key]
+        new_rows, changed_rows = [], []
+        for name, row in rows.items():
+            existing = matches[name]
+            if existing is None:
+                new_rows.append(dict({column: None for column in columns}, **row))
+                summary["changes"]["inserted"].append(name)
+            elif existing.content_hash == row["content_hash"] and row["source_url"] in (None, existing.source_url):
+                summary["unchanged"] += 1
+            else:
+                changed_rows.append((existing.id, row))
+                summary["changes"]["updated"].append(name)
+
+        if new_rows:
+            db.session.execute(table.insert(), new_rows)
+        if changed_rows:
+            cls._update_by_id(changed_rows)
+        summary["inserted"] += len(new_rows)
+        summary["updated"] += len(changed_rows)
+
+def parse_edited(value):
+    # SWAPI timestamps look like 2014-12-20T21:17:56.891000Z
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.rstrip("Z"), "%Y-%m-%dT%H:%M:%S.%f")
+    except (TypeError, ValueError):
+        return None
+
+def content_hash(row, fields):
+    payload = json.dumps([row.get(field, None) for field in fields if field != "id"], default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
 ## USER ##
 ##########
@@ -15,6 +284,8 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     favorite = db.relationship("Favorite", backref="user", uselist=True)
 
+    serialize_fields = ("id", "name", "username", "email")
+
     def __repr__(self):
         return '<User: %r>' % self.username
 
@@ -37,15 +308,29 @@ class Favorite(db.Model):
     nature = db.Column(db.String(50), nullable=False)
     nature_id = db.Column(db.Integer, nullable=False)
 
+    serialize_fields = ("user_id", "name", "nature", "nature_id")
+
     __table_args__ = (db.UniqueConstraint(
     'user_id',
     'name',
     name="dont_repeat_favorites"
+    ),
+    db.Index(
+    'ix_favorite_user_nature',
+    'user_id',
+    'nature',
+    'nature_id',
+    unique=True
     ),)
 
     def __repr__(self):
         return f"<Favorites object {self.id}>"
 
+    @classmethod
+    def lookup(cls, user_id, nature, nature_id):
+        # matches the (user_id, nature, nature_id) index column for column
+        return cls.query.filter_by(user_id=user_id, nature=nature, nature_id=nature_id)
+
     def serialize(self):
         return {
             "user_id": self.user_id,
@@ -54,17 +339,132 @@ class Favorite(db.Model):
             "nature_id": self.nature_id
         }
 
+## FAVORITE COUNT ##
+######################
+
+class FavoriteCount(db.Model):
+    # kept in step with Favorite by the routes that add or remove favorites
+    nature = db.Column(db.String(50), primary_key=True)
+    nature_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    # the leaderboard reads it backwards: WHERE nature = ? ORDER BY count DESC
+    __table_args__ = (
+        db.Index('ix_favorite_count_nature_count', 'nature', 'count', 'nature_id'),
+    )
+
+    def __repr__(self):
+        return f"<FavoriteCount {self.nature} {self.nature_id}: {self.count}>"
+
+    @classmethod
+    def add(cls, pairs, delta=1):
+        """
+        Adds `delta` to the count of every (nature, nature_id) in `pairs`, in
+        the caller's transaction: one upsert (an update when removing) per call.
+        """
+        totals = {}
+        for pair in pairs:
+            totals[pair] = totals.get(pair, 0) + delta
+        rows = [{"nature": nature, "nature_id": nature_id, "count": count} for (nature, nature_id), count in totals.items()]
+        if not rows:
+            return
+        if delta < 0:
+            cls._increment(rows)
+            return
+
+        table = cls.__table__
+        dialect_name = db.engine.dialect.name
+        insert = _dialect_insert(dialect_name)
+        if insert is not None:
+            stmt = insert(table)
+            if dialect_name == "mysql":
+                stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted["count"])
+            else:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["nature", "nature_id"], set_={"count": table.c.count + stmt.excluded["count"]}
+                )
+            db.session.execute(stmt, rows)
+            return
+
+        # dialects without an upsert construct: update what exists, insert the rest
+        existing = set(db.session.query(table.c.nature, table.c.nature_id).filter(
+            db.or_(*[db.and_(table.c.nature == nature, table.c.nature_id == nature_id) for nature, nature_id in totals])
+        ))
+        cls._increment([row for row in rows if (row["nature"], row["nature_id"]) in existing])
+        new_rows = [row for row in rows if (row["nature"], row["nature_id"]) not in existing]
+        if new_rows:
+            db.session.execute(table.insert(), new_rows)
+
+    @classmethod
+    def _increment(cls, rows):
+        if not rows:
+            return
+        table = cls.__table__
+        stmt = table.update().where(
+            db.and_(table.c.nature == bindparam("_nature"), table.c.nature_id == bindparam("_nature_id"))
+        ).values(count=table.c.count + bindparam("_count"))
+        db.session.execute(stmt, [{"_" + key: value for key, value in row.items()} for row in rows])
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recounts everything from the favorite table. The caller commits.
+        """
+        table = cls.__table__
+        favorite = Favorite.__table__
+        db.session.execute(table.delete())
+        counts = db.select(favorite.c.nature, favorite.c.nature_id, db.func.count()).group_by(favorite.c.nature, favorite.c.nature_id)
+        db.session.execute(table.insert().from_select(["nature", "nature_id", "count"], counts))
+        return db.session.query(db.func.count()).select_from(table).scalar()
+
+## CATALOG VERSION ##
+#######################
+
+class CatalogVersion(db.Model):
+    name = db.Column(db.String(25), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CatalogVersion {self.name}: {self.version}>"
+
+## REVOKED TOKEN ##
+###################
+
+class RevokedToken(db.Model):
+    # `key` is "jti:<token id>" for a single token or "sub:<user id>" for every token of a user
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<RevokedToken {self.key}>"
+
 ## ITEMS ADD ##
-class Character(db.Model):
+class Character(BulkUpsertMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     birth_year = db.Column(db.String(25), nullable=False)
-    gender = db.Column(db.String(25), nullable=False)
+    gender = db.Column(db.String(25), nullable=False, index=True)
     height = db.Column(db.Integer, nullable=False)
     mass = db.Column(db.Integer, nullable=False)
-    skin_color = db.Column(db.String(25), nullable=False)
-    eye_color = db.Column(db.String(25), nullable=False)
-    hair_color = db.Column(db.String(25), nullable=False)
+    skin_color = db.Column(db.String(25), nullable=False, index=True)
+    eye_color = db.Column(db.String(25), nullable=False, index=True)
+    hair_color = db.Column(db.String(25), nullable=False, index=True)
+    # where the row came from, see BulkUpsertMixin.sync_records
+    source_url = db.Column(db.String(250), unique=True)
+    edited = db.Column(db.DateTime)
+    content_hash = db.Column(db.String(40))
+
+    serialize_fields = ("id", "name", "birth_year", "gender", "height", "mass", "skin_color", "eye_color", "hair_color")
+    filter_fields = ("name", "gender", "skin_color", "eye_color", "hair_color")
+    range_fields = ("height", "mass")
+    sort_fields = ("id", "name", "height", "mass")
+
+    # (column, id) so range filters and keyset pages sorted by them use the index
+    __table_args__ = (
+        db.Index('ix_character_height_id', 'height', 'id'),
+        db.Index('ix_character_mass_id', 'mass', 'id'),
+    )
 
     def serialize(self):
         return{
@@ -83,43 +483,33 @@ class Character(db.Model):
         return '<Character: %r>' % self.name
         
     def __init__(self, *args, **kwargs):
+        # converted with the compiled schema, values that do not convert are left out
+        super().__init__(**self.coerce(kwargs))
 
-        for (key, value) in kwargs.items():
-            if hasattr(self, key):
-                attr_type = getattr(self.__class__, key).type
-
-                try:
-                    attr_type.python_type(value)
-                    setattr(self, key, value)
-                except Exception as error:
-                    print(f"ignore the other values: {error.args}")
-
-    @classmethod
-    def create(cls, data):
-        instance = cls(**data)
-        if (not isinstance(instance, cls)):
-            print("Something failed")
-            return None
-        db.session.add(instance)
-        try:
-            db.session.commit()
-            print(f"Created: {instance.name}")
-            return instance
-        except Exception as error:
-            db.session.rollback()
-            print(error.args)
 
-
-class Planet(db.Model):
+class Planet(BulkUpsertMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     diameter = db.Column(db.Integer, nullable=False)
-    gravity = db.Column(db.String(50), nullable=False)
-    terrain = db.Column(db.String(50), nullable=False)
+    gravity = db.Column(db.String(50), nullable=False, index=True)
+    terrain = db.Column(db.String(50), nullable=False, index=True)
     surface_water = db.Column(db.String(50), nullable=False)
     population = db.Column(db.Integer, nullable=False)
     rotation_period = db.Column(db.Integer, nullable=False)
     orbital_period = db.Column(db.Integer, nullable=False)
+    source_url = db.Column(db.String(250), unique=True)
+    edited = db.Column(db.DateTime)
+    content_hash = db.Column(db.String(40))
+
+    serialize_fields = ("id", "name", "diameter", "gravity", "terrain", "surface_water", "population", "rotation_period", "orbital_period")
+    filter_fields = ("name", "gravity", "terrain")
+    range_fields = ("diameter", "population")
+    sort_fields = ("id", "name", "diameter", "population")
+
+    __table_args__ = (
+        db.Index('ix_planet_diameter_id', 'diameter', 'id'),
+        db.Index('ix_planet_population_id', 'population', 'id'),
+    )
 
     def serialize(self):
         return{
@@ -138,28 +528,5 @@ class Planet(db.Model):
         return '<Planet: %r>' % self.name
     
     def __init__(self, *args, **kwargs):
-
-        for (key, value) in kwargs.items():
-            if hasattr(self, key):
-                attr_type = getattr(self.__class__, key).type
-
-                try:
-                    attr_type.python_type(value)
-                    setattr(self, key, value)
-                except Exception as error:
-                    print(f"ignore the other values: {error.args}")
-
-    @classmethod
-    def create(cls, data):
-        instance = cls(**data)
-        if (not isinstance(instance, cls)):
-            print("Something failed")
-            return None
-        db.session.add(instance)
-        try:
-            db.session.commit()
-            print(f"Created: {instance.name}")
-            return instance
-        except Exception as error:
-            db.session.rollback()
-            print(error.args)
\ No newline at end of file
+        # converted with the compiled schema, values that do not convert are left out
+        super().__init__(**self.coerce(kwargs))
@@ -0,0 +1,50 @@
+"""
+Sparse fieldsets: `?fields=id,name` turns into a column-only select whose rows
+are serialized by a function built once per (model, fields).
+"""
+from functools import lru_cache
+from operator import itemgetter
+from flask import request
+from models import db
+from utils import APIException
+
+def get_fields_arg(model):
+    value = request.args.get("fields", None)
+    if value is None or value.strip() == "":
+        return None
+    fields = []
+    for field in value.split(","):
+        field = field.strip()
+        if field == "" or field in fields:
+            continue
+        if field not in model.serialize_fields:
+            raise APIException(f"Unknown field '{field}'", status_code=400, payload={"allowed": list(model.serialize_fields)})
+        fields.append(field)
+    return tuple(fields)
+
+def selected_columns(model, fields, extra=()):
+    # `id` (and the sort column) are always selected so keyset pagination has its cursor
+    names = fields
+    for name in ("id",) + tuple(extra):
+        if name not in names and name in model.__table__.c:
+            names = names + (name,)
+    return names, [model.__table__.c[name] for name in names]
+
+@lru_cache(maxsize=256)
+def row_serializer(names, fields):
+    """
+    Builds `row -> {"name": row[1], ...}` for the given column order: one
+    itemgetter call picks the values, zipped with the field names, with no
+    lookups by name per row.
+    """
+    positions = [names.index(field) for field in fields]
+    if len(positions) == 1:
+        # itemgetter with a single position returns the value, not a tuple
+        field, position = fields[0], positions[0]
+        return lambda row: {field: row[position]}
+    getter = itemgetter(*positions) if positions else (lambda row: ())
+    return lambda row: dict(zip(fields, getter(row)))
+
+def projection(model, fields, extra=()):
+    names, columns = selected_columns(model, fields, extra)
+    return db.session.query(*columns), row_serializer(names, fields)
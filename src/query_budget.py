@@ -0,0 +1,88 @@
+"""
+Query budgets to catch N+1 regressions.
+
+    @app.route('/characters/<int:character_id>')
+    @query_budget(2)
+    def getCharacter(character_id): ...
+
+    with count_queries() as queries:
+        client.get('/characters/1')
+    assert len(queries) <= 2
+
+Over budget the statements are logged, or raised as `QueryBudgetExceeded`
+when the app is testing/debugging or `QUERY_BUDGET_MODE` is "raise".
+"""
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+class QueryBudgetExceeded(AssertionError):
+
+    def __init__(self, name, budget, statements):
+        self.name = name
+        self.budget = budget
+        self.statements = statements
+        listing = "\n".join(f"  {number}. {statement}" for number, statement in enumerate(statements, 1))
+        AssertionError.__init__(self, f"{name} ran {len(statements)} queries, budget is {budget}:\n{listing}")
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for statements in getattr(_local, "stack", ()):
+        statements.append(statement)
+
+@contextmanager
+def count_queries():
+    """
+    Collects every SQL statement run by the current thread inside the block.
+    """
+    statements = []
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(statements)
+    try:
+        yield statements
+    finally:
+        # by identity, list.remove() would take the first equal (e.g. empty) list
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] is statements:
+                del stack[index]
+                break
+
+def budget_mode(app):
+    mode = app.config.get("QUERY_BUDGET_MODE", None)
+    if mode is None:
+        mode = "raise" if app.testing or app.debug else "log"
+    return mode
+
+def check_budget(name, budget, statements):
+    if len(statements) <= budget:
+        return
+    mode = budget_mode(current_app)
+    if mode == "raise":
+        raise QueryBudgetExceeded(name, budget, statements)
+    if mode == "log":
+        current_app.logger.warning(str(QueryBudgetExceeded(name, budget, statements)))
+
+def query_budget(budget):
+    """
+    Route decorator: the view may run at most `budget` statements. Bodies
+    streamed after the view returns are not counted.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if budget_mode(current_app) == "off":
+                return view(*args, **kwargs)
+            with count_queries() as statements:
+                response = view(*args, **kwargs)
+            check_budget(view.__name__, budget, statements)
+            return response
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
@@ -0,0 +1,199 @@
+"""
+Read replica routing.
+
+    DB_REPLICA_URLS=postgresql://replica1/starwars,postgresql://replica2/starwars
+    DB_REPLICA_CHECK_INTERVAL=5    seconds between health checks of a replica
+    DB_REPLICA_RETRY=30            seconds a failed replica is left out
+    DB_REPLICA_MAX_LAG=0           postgresql only, seconds of replay lag tolerated (0: not checked)
+    DB_REPLICA_STICKY=5            seconds a client reads from the primary after a write
+
+Every replica is registered in SQLALCHEMY_BINDS as `replica_<n>`. Views
+decorated with `@read_replica` run their SELECTs on the next healthy replica,
+round robin; anything that writes, and every statement after a write in the
+same request, goes to the primary. A request that wrote sets the
+`db_primary_until` cookie, the same client reads from the primary until it
+expires so it sees its own writes. Bearer token clients don't keep cookies,
+so a user's own data is never read from a replica, and views behind
+`@jwt_required()` must not be wrapped by `@read_replica`: the token blocklist
+would be read on a lagging replica. With no replica configured (or none
+healthy) everything runs on the primary.
+"""
+import threading
+import time
+from functools import wraps
+from flask import g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm, text
+
+STICKY_COOKIE = "db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+class ReplicaRouter:
+
+    def __init__(self, check_interval=5.0, retry=30.0, max_lag=0.0, sticky=5.0):
+        self.check_interval = check_interval
+        self.retry = retry
+        self.max_lag = max_lag
+        self.sticky = sticky
+        self.app = None
+        self.db = None
+        self.names = []
+        # name -> (healthy, checked_at)
+        self.health = {}
+        self.position = 0
+        self.watched = set()
+        self.lock = threading.RLock()
+        self.stats = {"replica": 0, "sticky": 0, "unavailable": 0}
+
+    def init_app(self, app, db):
+        self.check_interval = app.config.get("DB_REPLICA_CHECK_INTERVAL", self.check_interval)
+        self.retry = app.config.get("DB_REPLICA_RETRY", self.retry)
+        self.max_lag = app.config.get("DB_REPLICA_MAX_LAG", self.max_lag)
+        self.sticky = app.config.get("DB_REPLICA_STICKY", self.sticky)
+        self.app = app
+        self.db = db
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        self.names = []
+        for number, uri in enumerate(app.config.get("DB_REPLICA_URLS") or ()):
+            name = f"replica_{number}"
+            binds[name] = uri
+            self.names.append(name)
+        self.health = {}
+        self.position = 0
+        if self.names:
+            app.config["SQLALCHEMY_BINDS"] = binds
+            app.before_request(self.reset_request)
+            app.after_request(self.mark_writer)
+        app.extensions["replica_router"] = self
+
+    ## HEALTH ##
+
+    def engine(self, name):
+        engine = self.db.get_engine(self.app, bind=name)
+        if engine not in self.watched:
+            # a dropped connection takes the replica out until the next check
+            event.listen(engine, "handle_error", lambda context: context.is_disconnect and self.mark_down(name))
+            self.watched.add(engine)
+        return engine
+
+    def is_healthy(self, name):
+        now = time.monotonic()
+        healthy, checked_at = self.health.get(name, (True, None))
+        wait = self.check_interval if healthy else self.retry
+        if checked_at is not None and now - checked_at < wait:
+            return healthy
+        healthy = self.check(name)
+        self.health[name] = (healthy, now)
+        return healthy
+
+    def check(self, name):
+        try:
+            engine = self.engine(name)
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                if self.max_lag and engine.dialect.name == "postgresql":
+                    # NULL when the server is not replaying anything
+                    lag = connection.execute(text(
+                        "SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                    )).scalar()
+                    if lag is not None and lag > self.max_lag:
+                        return False
+        except Exception:
+            return False
+        return True
+
+    def mark_down(self, name):
+        with self.lock:
+            self.health[name] = (False, time.monotonic())
+
+    def choose(self):
+        """
+        The next healthy replica, round robin, or None when none is.
+        """
+        with self.lock:
+            for offset in range(len(self.names)):
+                name = self.names[(self.position + offset) % len(self.names)]
+                if self.is_healthy(name):
+                    self.position = (self.position + offset + 1) % len(self.names)
+                    return name
+        return None
+
+    ## ROUTING ##
+
+    def is_sticky(self):
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def route_request(self):
+        if not self.names or request.method not in SAFE_METHODS:
+            return
+        if self.is_sticky():
+            self.stats["sticky"] += 1
+            return
+        name = self.choose()
+        if name is None:
+            self.stats["unavailable"] += 1
+            return
+        g.db_replica = name
+        self.stats["replica"] += 1
+
+    def engine_for(self, session, clause):
+        """
+        The replica engine for this statement, or None for the primary.
+        """
+        if not self.names or not has_request_context():
+            return None
+        if session._flushing or (clause is not None and getattr(clause, "is_dml", False)):
+            g.db_wrote = True
+            return None
+        name = g.get("db_replica", None)
+        if name is None or g.get("db_wrote", False):
+            return None
+        return self.engine(name)
+
+    def current_bind(self):
+        """
+        The replica the current request reads from, None for the primary.
+        """
+        if not self.names or not has_request_context() or g.get("db_wrote", False):
+            return None
+        return g.get("db_replica", None)
+
+    def reset_request(self):
+        # g outlives the request when an app context was pushed around it (tests, CLI)
+        g.pop("db_replica", None)
+        g.pop("db_wrote", None)
+
+    def mark_writer(self, response):
+        if g.get("db_wrote", False) and self.sticky:
+            until = time.time() + self.sticky
+            response.set_cookie(STICKY_COOKIE, f"{until:.3f}", max_age=int(self.sticky) + 1, httponly=True, samesite="Lax")
+        return response
+
+replica_router = ReplicaRouter()
+
+def read_replica(view):
+    """
+    Lets the view's reads go to a replica, see `ReplicaRouter.route_request`.
+    Goes inside `@jwt_required()`, never around it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica_router.route_request()
+        return view(*args, **kwargs)
+    return wrapper
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        engine = replica_router.engine_for(self, clause)
+        if engine is not None:
+            return engine
+        return super().get_bind(mapper, clause, **kwargs)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,190 @@
+"""
+JWT revocation list, checked by `@jwt_required()` through the blocklist loader.
+
+Revocations live in the `revoked_token` table, keyed "jti:<token id>" for a
+single token (logout) or "sub:<user id>" for every token issued to a user up
+to that moment (account deletion). Each worker mirrors the keys in a bloom
+filter it refreshes incrementally (`WHERE id > last seen id`) at most once
+every `JWT_REVOCATION_REFRESH` seconds, so the common not-revoked check is a
+few hash lookups and no SQL. Bloom hits are confirmed against the table and
+the answer kept in a small LRU/TTL cache.
+
+Tokens carry an `issued` claim with sub-second precision: a "sub:" cut-off
+made in the same second as a token was issued (an account deleted, its id
+reused by the next one) still tells them apart. Revoking a key again replaces
+its row, so the new cut-off gets a new id and the incremental refresh of
+every worker reads it. A revocation made by another worker is picked up within
+the refresh interval.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from models import db, RevokedToken
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # double hashing: two 64 bit halves of one digest give every position
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+def token_keys(payload):
+    keys = []
+    if "jti" in payload:
+        keys.append(f"jti:{payload['jti']}")
+    if "sub" in payload:
+        keys.append(f"sub:{payload['sub']}")
+    return keys
+
+def epoch(value):
+    # revoked_at is a naive UTC datetime, the microseconds are kept
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class TokenBlocklist:
+    # ids below the last seen one are re-read, transactions do not commit in id order
+    refresh_overlap = 100
+
+    def __init__(self, capacity=100000, error_rate=0.001, refresh_interval=1.0, cache_size=4096, cache_ttl=60.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.reset()
+
+    def init_app(self, app, jwt):
+        self.enabled = app.config.get("JWT_REVOCATION_ENABLED", self.enabled)
+        self.capacity = app.config.get("JWT_REVOCATION_CAPACITY", self.capacity)
+        self.refresh_interval = app.config.get("JWT_REVOCATION_REFRESH", self.refresh_interval)
+        self.cache_size = app.config.get("JWT_REVOCATION_CACHE_SIZE", self.cache_size)
+        self.cache_ttl = app.config.get("JWT_REVOCATION_CACHE_TTL", self.cache_ttl)
+        self.reset()
+        jwt.token_in_blocklist_loader(self.check_token)
+        jwt.additional_claims_loader(self.issued_claims)
+        app.extensions["token_blocklist"] = self
+
+    def reset(self):
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self.last_id = 0
+        self.refreshed_at = None
+        self.cache.clear()
+        self.stats = {"bloom_negative": 0, "cache_hits": 0, "lookups": 0, "refreshes": 0}
+
+    ## LOADING ##
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.refreshed_at is not None and now - self.refreshed_at < self.refresh_interval:
+            return
+        with self.lock:
+            self.refreshed_at = now
+            self.stats["refreshes"] += 1
+            rows = db.session.query(RevokedToken.id, RevokedToken.key).filter(
+                RevokedToken.id > self.last_id - self.refresh_overlap
+            ).order_by(RevokedToken.id).all()
+            for id, key in rows:
+                if key not in self.bloom:
+                    self.bloom.add(key)
+                self.cache.pop(key, None)
+                self.last_id = max(self.last_id, id)
+            if self.bloom.count > self.bloom.capacity:
+                # past its capacity the false positive rate climbs, rebuild it larger
+                self.capacity = self.bloom.count * 2
+                self.bloom = BloomFilter(self.capacity, self.error_rate)
+                for (key,) in db.session.query(RevokedToken.key):
+                    self.bloom.add(key)
+
+    ## CHECKS ##
+
+    def revoked_at(self, key):
+        """
+        When `key` was revoked (epoch seconds), or None. The bloom filter
+        answers most misses, the rest go through the cache and the table.
+        """
+        if key not in self.bloom:
+            self.stats["bloom_negative"] += 1
+            return None
+        now = time.monotonic()
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None and cached[1] > now:
+                self.cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return cached[0]
+        self.stats["lookups"] += 1
+        row = db.session.query(RevokedToken.revoked_at).filter(RevokedToken.key == key).first()
+        value = epoch(row[0]) if row is not None else None
+        with self.lock:
+            self.cache[key] = (value, now + self.cache_ttl)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return value
+
+    def is_revoked(self, payload):
+        self.refresh()
+        for key in token_keys(payload):
+            revoked_at = self.revoked_at(key)
+            if revoked_at is None:
+                continue
+            # a user revocation only covers the tokens issued before it, `iat` is in whole seconds
+            if key.startswith("jti:") or payload.get("issued", payload.get("iat", 0)) <= revoked_at:
+                return True
+        return False
+
+    def issued_claims(self, identity):
+        return {"issued": time.time()}
+
+    def check_token(self, jwt_header, jwt_payload):
+        if not self.enabled:
+            return False
+        return self.is_revoked(jwt_payload)
+
+    ## REVOKING ##
+
+    def revoke(self, key):
+        """
+        Records the revocation in the current transaction, the caller commits.
+        Revoking a user again moves its cut-off to now: the row is replaced,
+        an update in place keeps its id and other workers would not re-read it.
+        """
+        RevokedToken.query.filter_by(key=key).delete(synchronize_session=False)
+        db.session.add(RevokedToken(key=key))
+        with self.lock:
+            self.bloom.add(key)
+            self.cache.pop(key, None)
+
+    def revoke_token(self, payload):
+        self.revoke(f"jti:{payload['jti']}")
+
+    def revoke_user(self, user_id):
+        self.revoke(f"sub:{user_id}")
+
+token_blocklist = TokenBlocklist()
@@ -0,0 +1,170 @@
+"""
+Record coercion and validation compiled once per model from its columns.
+
+    schema = Character.schema()
+    row, errors = schema.validate({"name": "Luke", "mass": "1,358", ...})
+    rows, failures = schema.validate_many(records)
+
+Numbers accept the SWAPI formats ("1,000", "78.2", 172) and read "unknown",
+"n/a", "none" and "" as NULL; strings are stripped and checked against the
+column length. A NULL in a NOT NULL column is a "required" error. Errors are
+dicts: {"field": .., "error": "required" | "invalid" | "too_long", "value": ..}.
+"""
+import math
+from datetime import datetime
+
+UNKNOWN_VALUES = frozenset(("", "unknown", "n/a", "none", "null"))
+
+class Invalid(ValueError):
+    pass
+
+def to_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        # inf and nan have no integer value
+        if not math.isfinite(value):
+            raise Invalid(value)
+        return int(value)
+    text = str(value).strip()
+    if text.lower() in UNKNOWN_VALUES:
+        return None
+    text = text.replace(",", "")
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        raise Invalid(value)
+    if not math.isfinite(number):
+        raise Invalid(value)
+    return int(number)
+
+def to_float(value):
+    text = None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value
+    else:
+        text = str(value).strip()
+        if text.lower() in UNKNOWN_VALUES:
+            return None
+        number = text.replace(",", "")
+    try:
+        number = float(number)
+    except (ValueError, OverflowError):
+        # OverflowError: an int too large for a float
+        raise Invalid(value)
+    # "1e400", "inf" and "nan" parse but can't be stored
+    if not math.isfinite(number):
+        raise Invalid(value)
+    return number
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on"):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    if text in UNKNOWN_VALUES:
+        return None
+    raise Invalid(value)
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    if text.lower() in UNKNOWN_VALUES:
+        return None
+    try:
+        return datetime.fromisoformat(text.rstrip("Z"))
+    except ValueError:
+        raise Invalid(value)
+
+def string_converter(length):
+    def to_str(value):
+        text = value.strip() if isinstance(value, str) else str(value)
+        if text == "":
+            return None
+        if length is not None and len(text) > length:
+            raise Invalid(value, "too_long")
+        return text
+    return to_str
+
+CONVERTERS = {int: to_int, float: to_float, bool: to_bool, datetime: to_datetime}
+
+def converter_for(column):
+    python_type = column.type.python_type
+    if python_type is str:
+        return string_converter(getattr(column.type, "length", None))
+    return CONVERTERS.get(python_type, python_type)
+
+class ModelSchema:
+
+    def __init__(self, table, exclude=()):
+        # (name, converter, required) for every writable column, resolved once
+        self.fields = tuple(
+            (column.name, converter_for(column), not column.nullable and column.default is None)
+            for column in table.columns
+            if not column.primary_key and column.name not in exclude
+        )
+        self.names = frozenset(name for name, _, _ in self.fields)
+
+    def validate(self, data):
+        """
+        Returns `(row, errors)`: the coerced values present in `data` and a
+        list of errors, empty when the record is valid.
+        """
+        row = {}
+        errors = []
+        get = data.get
+        for name, convert, required in self.fields:
+            value = get(name)
+            if value is not None:
+                raw = value
+                try:
+                    value = convert(value)
+                except Invalid as error:
+                    reason = error.args[1] if len(error.args) > 1 else "invalid"
+                    errors.append({"field": name, "error": reason, "value": raw})
+                    continue
+                except (TypeError, ValueError, OverflowError):
+                    errors.append({"field": name, "error": "invalid", "value": raw})
+                    continue
+            if value is None:
+                if required:
+                    errors.append({"field": name, "error": "required", "value": get(name)})
+                continue
+            row[name] = value
+        return row, errors
+
+    def validate_many(self, records):
+        """
+        Validates a batch: returns the valid rows and, for the others,
+        `{"index": position in records, "errors": [...]}`.
+        """
+        rows = []
+        failures = []
+        validate = self.validate
+        for index, data in enumerate(records):
+            row, errors = validate(data)
+            if errors:
+                failures.append({"index": index, "errors": errors})
+            else:
+                rows.append(row)
+        return rows, failures
+
+    def coerce(self, data):
+        # lenient: the values that convert, unknown keys and bad values are dropped
+        row = {}
+        for name, convert, required in self.fields:
+            if name in data:
+                try:
+                    value = convert(data[name]) if data[name] is not None else None
+                except (TypeError, ValueError, OverflowError):
+                    continue
+                row[name] = value
+        return row
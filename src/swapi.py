@@ -0,0 +1,116 @@
+"""
+SWAPI ingestion client: a pooled keep-alive session that follows the `next`
+links of a listing and fetches the detail pages concurrently. With a cache
+(see swapi_cache.py) fresh responses are served from disk, stale ones are
+revalidated, and offline mode never goes to the network.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils import APIException
+from metrics import observe_swapi
+from swapi_cache import CacheEntry, cache_from_config
+
+DEFAULT_BASE_URL = "https://swapi.dev/api"
+
+class SwapiClient:
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, concurrency=8, retries=3, backoff=0.5, timeout=10,
+                 cache=None, cache_ttl=86400, offline=False):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.offline = offline
+        if offline and cache is None:
+            raise ValueError("SWAPI offline mode needs SWAPI_CACHE_BACKEND")
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",)
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            base_url=config.get("SWAPI_BASE_URL", DEFAULT_BASE_URL),
+            concurrency=int(config.get("SWAPI_CONCURRENCY", 8)),
+            retries=int(config.get("SWAPI_RETRIES", 3)),
+            backoff=float(config.get("SWAPI_BACKOFF", 0.5)),
+            timeout=float(config.get("SWAPI_TIMEOUT", 10)),
+            cache=cache_from_config(config),
+            cache_ttl=float(config.get("SWAPI_CACHE_TTL", 86400)),
+            offline=bool(config.get("SWAPI_OFFLINE", False))
+        )
+
+    def get(self, url, kind="detail"):
+        start = time.perf_counter()
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and (self.offline or entry.is_fresh(self.cache_ttl)):
+            observe_swapi(kind, time.perf_counter() - start, "cached")
+            return self.decode(entry, url)
+        if self.offline:
+            observe_swapi(kind, time.perf_counter() - start, "error")
+            raise APIException(f"SWAPI offline mode: {url} is not cached", status_code=502)
+
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=entry.validators() if entry else None)
+            if response.status_code == 304 and entry is not None:
+                # still valid upstream, only its age is reset
+                entry.stored_at = time.time()
+                self.cache.put(entry)
+                observe_swapi(kind, time.perf_counter() - start, "revalidated")
+                return self.decode(entry, url)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as error:
+            observe_swapi(kind, time.perf_counter() - start, "error")
+            raise APIException(f"SWAPI request failed: {url}", status_code=502, payload={"error": str(error)})
+        if self.cache is not None:
+            self.cache.put(CacheEntry(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified")))
+        observe_swapi(kind, time.perf_counter() - start)
+        return data
+
+    def decode(self, entry, url):
+        try:
+            return json.loads(entry.body)
+        except ValueError as error:
+            raise APIException(f"SWAPI cache entry is corrupt: {url}", status_code=502, payload={"error": str(error)})
+
+    def iter_listing(self, resource):
+        # follow the `next` links until the last page
+        url = f"{self.base_url}/{resource}/"
+        while url:
+            page = self.get(url, "listing")
+            for result in page.get("results", []):
+                yield result
+            url = page.get("next")
+
+    def fetch_all(self, urls):
+        # results come back in the same order as `urls`
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(self.get, urls))
+
+    def fetch_resource(self, resource):
+        urls = [result["url"] for result in self.iter_listing(resource)]
+        return self.fetch_all(urls)
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
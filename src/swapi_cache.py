@@ -0,0 +1,166 @@
+"""
+On-disk HTTP cache for the SWAPI client.
+
+    SWAPI_CACHE_BACKEND=file|sqlite   (unset: no cache)
+    SWAPI_CACHE_PATH=.swapi-cache     directory (file) or database file (sqlite)
+    SWAPI_CACHE_TTL=86400             seconds an entry is served without asking SWAPI
+    SWAPI_CACHE_MAX_BYTES=268435456   least recently used entries are evicted past it
+    SWAPI_OFFLINE=true                serve from the cache only, never touch the network
+
+Both backends store the body with its ETag / Last-Modified so stale entries
+are revalidated with a conditional GET instead of downloaded again.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+class CacheEntry:
+
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class FileCache:
+    """
+    One file per url, named by the sha256 of the url: a JSON header line
+    followed by the body. The file mtime is the LRU clock.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".entry"))
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".entry")
+
+    def get(self, url):
+        path = self.path(url)
+        try:
+            with open(path, "rb") as file:
+                header = json.loads(file.readline())
+                body = file.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(url, body, header.get("etag"), header.get("last_modified"), header.get("stored_at"))
+
+    def put(self, entry):
+        header = json.dumps({
+            "url": entry.url, "etag": entry.etag, "last_modified": entry.last_modified, "stored_at": entry.stored_at
+        }).encode("utf-8")
+        path = self.path(entry.url)
+        # written next to the target and renamed, readers never see half a file
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(header + b"\n" + entry.body)
+        with self.lock:
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temporary, path)
+            self.size += os.path.getsize(path)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".entry")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self.size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def close(self):
+        pass
+
+class SqliteCache:
+    """
+    A single SQLite file, `accessed_at` is the LRU clock.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS swapi_cache (url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, "
+            "last_modified TEXT, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ix_swapi_cache_accessed_at ON swapi_cache (accessed_at)")
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM swapi_cache").fetchone()[0]
+
+    def get(self, url):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, etag, last_modified, stored_at FROM swapi_cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE swapi_cache SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        return CacheEntry(url, row[0], row[1], row[2], row[3])
+
+    def put(self, entry):
+        with self.lock:
+            previous = self.connection.execute("SELECT size FROM swapi_cache WHERE url = ?", (entry.url,)).fetchone()
+            self.size += len(entry.body) - (previous[0] if previous else 0)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO swapi_cache (url, body, etag, last_modified, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.url, entry.body, entry.etag, entry.last_modified, entry.stored_at, time.time(), len(entry.body))
+            )
+            self.evict()
+
+    def evict(self):
+        if self.size <= self.max_bytes:
+            return
+        for url, entry_size in self.connection.execute("SELECT url, size FROM swapi_cache ORDER BY accessed_at").fetchall():
+            if self.size <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM swapi_cache WHERE url = ?", (url,))
+            self.size -= entry_size
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+CACHE_BACKENDS = {"file": FileCache, "sqlite": SqliteCache}
+
+def cache_from_config(config):
+    backend = config.get("SWAPI_CACHE_BACKEND", None)
+    if not backend:
+        return None
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"SWAPI_CACHE_BACKEND must be one of {sorted(CACHE_BACKENDS)}, not '{backend}'")
+    path = config.get("SWAPI_CACHE_PATH", ".swapi-cache")
+    if backend == "sqlite" and not path.endswith(".sqlite"):
+        path = os.path.join(path, "swapi.sqlite")
+    return CACHE_BACKENDS[backend](path, int(config.get("SWAPI_CACHE_MAX_BYTES", 256 * 1024 * 1024)))
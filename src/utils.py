@@ -1,4 +1,15 @@
-from flask import jsonify, url_for
+import json
+from flask import jsonify, url_for, request, Response, stream_with_context
+from sqlalchemy import or_, and_
+from werkzeug.routing import IntegerConverter
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+STREAM_BATCH_SIZE = 1000
+# the range of a 64 bit integer column; past it the driver raises OverflowError,
+# after the headers when the body is streamed
+MIN_DB_INT = -2 ** 63
+MAX_DB_INT = 2 ** 63 - 1
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +26,152 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def check_db_int(name, value):
+    if not MIN_DB_INT <= value <= MAX_DB_INT:
+        raise APIException(f"'{name}' is out of range", status_code=400)
+    return value
+
+class DbIntConverter(IntegerConverter):
+    # `<int:id>` past a 64 bit column does not match the route: a 404
+    def __init__(self, map, *args, **kwargs):
+        kwargs.setdefault("max", MAX_DB_INT)
+        super().__init__(map, *args, **kwargs)
+
+def get_int_arg(name, default=None, minimum=0, maximum=None):
+    value = request.args.get(name, None)
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise APIException(f"'{name}' must be an integer", status_code=400)
+    if value < minimum:
+        raise APIException(f"'{name}' must be >= {minimum}", status_code=400)
+    if maximum is not None and value > maximum:
+        raise APIException(f"'{name}' must be <= {maximum}", status_code=400)
+    return check_db_int(name, value)
+
+def get_id_list_arg(name, maximum):
+    value = request.args.get(name, "")
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip() != ""]
+    except ValueError:
+        raise APIException(f"'{name}' must be a comma separated list of integers", status_code=400)
+    if len(ids) == 0:
+        raise APIException(f"'{name}' must contain at least one id", status_code=400)
+    if len(ids) > maximum:
+        raise APIException(f"'{name}' accepts at most {maximum} ids", status_code=400)
+    return [check_db_int(name, id) for id in ids]
+
+def wants_pagination():
+    return "limit" in request.args or "after" in request.args
+
+def keyset_order(model, sort):
+    column, descending = sort
+    if column.key == "id":
+        return [model.id.desc() if descending else model.id]
+    return [column.desc() if descending else column, model.id]
+
+def keyset_filter(query, model, sort, after):
+    """
+    `after` is the last id of the previous page, or `<value>:<id>` when the
+    list is sorted by another column (ties are broken by id).
+    """
+    column, descending = sort
+    if column.key == "id":
+        try:
+            last_id = int(after)
+        except ValueError:
+            raise APIException("'after' must be an integer", status_code=400)
+        check_db_int("after", last_id)
+        return query.filter(model.id < last_id if descending else model.id > last_id)
+
+    value, _, last_id = after.rpartition(":")
+    try:
+        value = column.type.python_type(value)
+        last_id = int(last_id)
+    except ValueError:
+        raise APIException("'after' must look like <value>:<id>", status_code=400)
+    check_db_int("after", last_id)
+    if isinstance(value, int):
+        check_db_int("after", value)
+    beyond = column < value if descending else column > value
+    return query.filter(or_(beyond, and_(column == value, model.id > last_id)))
+
+def keyset_cursor(item, sort):
+    column, descending = sort
+    if column.key == "id":
+        return item.id
+    return f"{getattr(item, column.key)}:{item.id}"
+
+def paginate_keyset(query, model, serialize=None, sort=None):
+    """
+    Cursor based pagination: `?limit=N&after=<cursor>`. Every page is a single
+    `WHERE <past the cursor> ORDER BY <sort>, id LIMIT :limit + 1` so the cost
+    does not grow with the page number like OFFSET does.
+    """
+    limit = get_int_arg("limit", DEFAULT_PAGE_LIMIT, minimum=1, maximum=MAX_PAGE_LIMIT)
+    after = request.args.get("after", None)
+    serialize = serialize or (lambda item: item.serialize())
+    sort = sort or (model.id, False)
+
+    if after:
+        query = keyset_filter(query, model, sort, after)
+    items = query.order_by(*keyset_order(model, sort)).limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    next_url = None
+    if has_more:
+        args = request.args.to_dict()
+        args.update(limit=limit, after=keyset_cursor(items[-1], sort))
+        next_url = url_for(request.endpoint, **request.view_args, **args)
+
+    response = jsonify({
+        "results": list(map(serialize, items)),
+        "limit": limit,
+        "next": next_url
+    })
+    if next_url is not None:
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+def stream_json_array(query, model, serialize=None, sort=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Streams the whole table as a JSON array without building it in memory,
+    rows are fetched `batch_size` at a time through `yield_per`.
+    """
+    serialize = serialize or (lambda item: item.serialize())
+    sort = sort or (model.id, False)
+
+    def generate():
+        yield "["
+        separator = ""
+        chunk = []
+        for item in query.order_by(*keyset_order(model, sort)).yield_per(batch_size):
+            chunk.append(separator + json.dumps(serialize(item)))
+            separator = ","
+            if len(chunk) >= batch_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+def list_response(query, model, serialize=None, sort=None):
+    if wants_pagination():
+        return paginate_keyset(query, model, serialize, sort)
+    return stream_json_array(query, model, serialize, sort)
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if 'admin' in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
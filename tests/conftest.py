@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# after src: benchmarks/ has scripts named like src modules
+sys.path.append(os.path.join(ROOT, "benchmarks"))
+
+from main import create_app
+from models import db, User, Character, Planet
+from cache import catalog_cache
+
+# valid bodies for POST /characters and POST /planets
+CHARACTER = {"name": "Luke", "birth_year": "19BBY", "gender": "male", "height": "172", "mass": "77",
+             "skin_color": "fair", "eye_color": "blue", "hair_color": "blond"}
+PLANET = {"name": "Tatooine", "rotation_period": "23", "orbital_period": "304", "diameter": "10465",
+          "gravity": "1 standard", "terrain": "desert", "surface_water": "1", "population": "200000"}
+
+def make_app(path, **config):
+    settings = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+        "JWT_SECRET_KEY": "test",
+        "ADMIN_ENABLED": False,
+        "MIGRATE_ENABLED": False,
+        # the blocklist is loaded once, later checks run no query
+        "JWT_REVOCATION_REFRESH": 3600.0
+    }
+    settings.update(config)
+    app = create_app(settings)
+    with app.app_context():
+        db.create_all()
+    catalog_cache.entries.clear()
+    catalog_cache.versions.clear()
+    return app
+
+@pytest.fixture
+def app(tmp_path):
+    return make_app(tmp_path / "test.sqlite")
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def seed_catalog(app, count=10):
+    with app.app_context():
+        db.session.execute(Character.__table__.insert(), [{
+            "name": f"Character {n}", "birth_year": "19BBY", "gender": "male" if n % 2 else "female", "height": 150 + n,
+            "mass": 50 + n, "skin_color": "fair", "eye_color": "blue", "hair_color": "blond"
+        } for n in range(1, count + 1)])
+        db.session.execute(Planet.__table__.insert(), [{
+            "name": f"Planet {n}", "diameter": 1000 * n, "gravity": "1 standard", "terrain": "desert",
+            "surface_water": "1", "population": 10000 * n, "rotation_period": 24, "orbital_period": 300 + n
+        } for n in range(1, count + 1)])
+        db.session.commit()
+
+@pytest.fixture
+def catalog(app):
+    seed_catalog(app)
+
+@pytest.fixture
+def auth(app, client):
+    """
+    Headers of a logged in user. A first protected request loads the token
+    blocklist so the tests only count the route's own queries.
+    """
+    with app.app_context():
+        db.session.add(User(name="Luke", username="luke", password="secret", email="luke@example.com"))
+        db.session.commit()
+    token = client.post("/login", json={"username": "luke", "password": "secret"}).json["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/users/favorites", headers=headers)
+    return headers
@@ -0,0 +1,26 @@
+import pytest
+
+TOO_LARGE = "99999999999999999999"
+
+@pytest.mark.parametrize("url, name", [
+    (f"/characters?ids=1,{TOO_LARGE}", "ids"),
+    (f"/planets?ids={TOO_LARGE}", "ids"),
+    (f"/characters?after={TOO_LARGE}", "after"),
+    (f"/characters?sort=height&after={TOO_LARGE}:1", "after"),
+    (f"/characters?sort=height&after=150:{TOO_LARGE}", "after"),
+    (f"/characters?height_min={TOO_LARGE}", "height_min"),
+    (f"/planets?population_max=-{TOO_LARGE}", "population_max"),
+    (f"/characters/export?height_max={TOO_LARGE}", "height_max"),
+    (f"/stats/favorites/top?limit={TOO_LARGE}", "limit"),
+])
+def test_out_of_range_integers_are_a_400(client, catalog, url, name):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert name in response.json["message"]
+
+def test_non_integer_range_filter_is_a_400(client, catalog):
+    assert client.get("/characters?height_min=1e30").status_code == 400
+
+def test_out_of_range_path_id_is_a_404(client, catalog):
+    assert client.get(f"/characters/{TOO_LARGE}").status_code == 404
+    assert client.get(f"/characters/{2 ** 63 - 1}").status_code == 404
@@ -0,0 +1,36 @@
+from conftest import CHARACTER, make_app, seed_catalog
+from models import db, Character
+
+def test_etag_only_validates_its_own_url(client, catalog):
+    etag = client.get("/characters/1").headers["ETag"]
+
+    assert client.get("/characters/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/characters/2", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/characters/999", headers={"If-None-Match": etag}).status_code == 404
+
+def test_write_invalidates_the_etag(client, catalog):
+    etag = client.get("/characters/1").headers["ETag"]
+    client.post("/characters", json=dict(CHARACTER, name="Han"))
+
+    assert client.get("/characters/1", headers={"If-None-Match": etag}).status_code == 200
+
+def test_admin_edits_invalidate_the_cache(tmp_path):
+    app = make_app(tmp_path / "admin.sqlite", ADMIN_ENABLED=True)
+    seed_catalog(app, 3)
+    client = app.test_client()
+    etag = client.get("/characters/1").headers["ETag"]
+    assert client.get("/characters/1").json["name"] == "Character 1"
+
+    with app.app_context():
+        form = {column.name: getattr(Character.query.get(1), column.name) for column in Character.__table__.columns}
+    form.update(name="Edited In Admin")
+    form = {name: "" if value is None else str(value) for name, value in form.items() if name != "id"}
+    response = client.post("/admin/character/edit/?id=1", data=form)
+    assert response.status_code == 302
+
+    assert client.get("/characters/1").json["name"] == "Edited In Admin"
+    assert client.get("/characters/1", headers={"If-None-Match": etag}).status_code == 200
+
+    etag = client.get("/characters/2").headers["ETag"]
+    assert client.post("/admin/character/delete/", data={"id": "2"}).status_code == 302
+    assert client.get("/characters/2", headers={"If-None-Match": etag}).status_code == 404
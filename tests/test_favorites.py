@@ -0,0 +1,41 @@
+from models import db, Favorite, Character
+from query_budget import count_queries
+from conftest import seed_catalog
+
+def add_favorites(app, count):
+    with app.app_context():
+        for n in range(1, count + 1):
+            db.session.add(Favorite(user_id=1, name=f"Character {n}", nature="character", nature_id=n))
+            db.session.add(Favorite(user_id=1, name=f"Planet {n}", nature="planet", nature_id=n))
+        db.session.commit()
+
+def test_expanded_favorites_run_a_single_query(app, client, auth):
+    seed_catalog(app, 20)
+    add_favorites(app, 20)
+
+    with count_queries() as statements:
+        response = client.get("/users/favorites?expand=1", headers=auth)
+    assert response.status_code == 200
+    assert len(statements) == 1, "\n".join(statements)
+
+    favorites = response.json
+    assert len(favorites) == 40
+    for favorite in favorites:
+        embedded = favorite[favorite["nature"]]
+        assert embedded["id"] == favorite["nature_id"]
+        assert embedded["name"] == favorite["name"]
+
+def test_expanded_favorite_of_a_deleted_row_is_null(app, client, auth):
+    seed_catalog(app, 3)
+    add_favorites(app, 3)
+    with app.app_context():
+        Character.query.filter_by(id=2).delete()
+        db.session.commit()
+
+    with count_queries() as statements:
+        favorites = client.get("/users/favorites?expand=1", headers=auth).json
+    assert len(statements) == 1
+    by_key = {(favorite["nature"], favorite["nature_id"]): favorite for favorite in favorites}
+    assert by_key[("character", 2)]["character"] is None
+    assert by_key[("character", 1)]["character"]["name"] == "Character 1"
+    assert by_key[("planet", 2)]["planet"]["name"] == "Planet 2"
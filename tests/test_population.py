@@ -0,0 +1,36 @@
+import pytest
+from models import db, Character
+from swapi_stub import SwapiStub
+from conftest import CHARACTER
+
+@pytest.fixture
+def stub():
+    stub = SwapiStub(people=5, planets=5).start()
+    yield stub
+    stub.stop()
+
+@pytest.mark.parametrize("mode", ["full", "incremental"])
+def test_renamed_record_updates_its_row(app, client, stub, mode):
+    app.config["SWAPI_BASE_URL"] = stub.base_url
+    assert client.post(f"/population/characters?mode={mode}").status_code == 200
+    stub.resources["people"][0]["name"] = "Renamed Upstream"
+
+    response = client.post(f"/population/characters?mode={mode}")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.json["inserted"] == 0
+    with app.app_context():
+        assert Character.query.count() == 5
+        row = Character.query.filter_by(name="Renamed Upstream").one()
+        assert row.source_url.endswith("/people/1/")
+
+def test_import_without_url_keeps_the_stored_url(app):
+    records = [dict(CHARACTER, url="https://swapi.dev/api/people/1/")]
+    with app.app_context():
+        assert Character.bulk_upsert(records)["inserted"] == 1
+        del records[0]["url"]
+        records[0]["mass"] = "80"
+        assert Character.bulk_upsert(records)["updated"] == 1
+        assert Character.sync_records(records)["unchanged"] == 1
+        db.session.commit()
+        row = Character.query.one()
+        assert (row.mass, row.source_url) == (80, "https://swapi.dev/api/people/1/")
@@ -0,0 +1,10 @@
+from projection import row_serializer
+
+def test_row_serializer_maps_fields_to_their_column():
+    names = ("name", "height", "id")
+    assert row_serializer(names, ("id", "name"))(("Luke", 172, 1)) == {"id": 1, "name": "Luke"}
+    assert row_serializer(names, ("height",))(("Luke", 172, 1)) == {"height": 172}
+    assert row_serializer(names, ())(("Luke", 172, 1)) == {}
+
+def test_sparse_fieldset_route(client, catalog):
+    assert client.get("/characters/3?fields=name,height").json == {"name": "Character 3", "height": 153}
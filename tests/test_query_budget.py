@@ -0,0 +1,140 @@
+"""
+Pins the query budget of every route in main.py.
+
+Each scenario runs through the test client inside `count_queries()`, body
+included: with TESTING on a view over its budget raises
+QueryBudgetExceeded, and the statements a streamed body runs after the view
+returned (not seen by the decorator) are pinned with `streamed`.
+"""
+import pytest
+from main import api, population
+from models import db, Character, Planet
+from query_budget import count_queries, query_budget, QueryBudgetExceeded
+from swapi_stub import SwapiStub
+from conftest import CHARACTER, PLANET
+
+BUDGETS = {
+    "sitemap": 0,
+    "api.login": 1,
+    "api.logout": 2,
+    "api.getUsers": 1,
+    "api.register_user": 2,
+    "api.delete_user": 6,
+    "api.getCharacters": 2,
+    "api.getCharacter": 2,
+    "api.export_characters": 0,
+    "api.register_characters": 4,
+    "api.getPlanets": 2,
+    "api.getplanet": 2,
+    "api.export_planets": 0,
+    "api.register_planet": 4,
+    "api.getFavorites": 1,
+    "api.export_favorites": 0,
+    "api.favorite_character": 3,
+    "api.favorite_planet": 3,
+    "api.favorite_character_delete": 2,
+    "api.favorite_planet_delete": 2,
+    "api.favorites_batch_add": 5,
+    "api.favorites_batch_delete": 3,
+    "api.favorites_top": 1,
+    "api.favorite_count": 1,
+    "api.cache_stats": 0,
+    "population.population_character": 6,
+    "population.handle_characters": 6,
+}
+
+FAVORITES = [{"nature": "character", "nature_id": 1}, {"nature": "planet", "nature_id": 2}, {"nature": "character", "nature_id": 99}]
+
+# (endpoint, method, url, json body, statements run by the streamed body)
+SCENARIOS = [
+    ("sitemap", "GET", "/", None, 0),
+    ("api.login", "POST", "/login", {"username": "luke", "password": "secret"}, 0),
+    ("api.logout", "POST", "/logout", None, 0),
+    ("api.getUsers", "GET", "/users", None, 0),
+    ("api.register_user", "POST", "/users", {"name": "Leia", "username": "leia", "email": "leia@example.com", "password": "x"}, 0),
+    ("api.delete_user", "DELETE", "/users", None, 0),
+    ("api.getCharacters", "GET", "/characters", None, 1),
+    ("api.getCharacters", "GET", "/characters?limit=3&sort=-height", None, 0),
+    ("api.getCharacters", "GET", "/characters?ids=1,2,99", None, 0),
+    ("api.getCharacters", "GET", "/characters?fields=id,name&gender=male", None, 1),
+    ("api.getCharacter", "GET", "/characters/1", None, 0),
+    ("api.export_characters", "GET", "/characters/export", None, 1),
+    ("api.export_characters", "GET", "/characters/export?format=csv", None, 1),
+    ("api.register_characters", "POST", "/characters", CHARACTER, 0),
+    ("api.getPlanets", "GET", "/planets", None, 1),
+    ("api.getPlanets", "GET", "/planets?limit=3", None, 0),
+    ("api.getplanet", "GET", "/planets/1?fields=name", None, 0),
+    ("api.export_planets", "GET", "/planets/export", None, 1),
+    ("api.register_planet", "POST", "/planets", PLANET, 0),
+    ("api.getFavorites", "GET", "/users/favorites", None, 0),
+    ("api.getFavorites", "GET", "/users/favorites?expand=1", None, 0),
+    ("api.export_favorites", "GET", "/users/favorites/export", None, 1),
+    ("api.favorite_character", "POST", "/favorite/character/3", {"name": "Character 3"}, 0),
+    ("api.favorite_planet", "POST", "/favorite/planet/3", {"name": "Planet 3"}, 0),
+    ("api.favorite_character_delete", "DELETE", "/favorite/character/1", None, 0),
+    ("api.favorite_planet_delete", "DELETE", "/favorite/planet/1", None, 0),
+    ("api.favorites_batch_add", "POST", "/users/favorites/batch", FAVORITES, 0),
+    ("api.favorites_batch_delete", "DELETE", "/users/favorites/batch", FAVORITES, 0),
+    ("api.favorites_top", "GET", "/stats/favorites/top?nature=character&limit=5", None, 0),
+    ("api.favorite_count", "GET", "/stats/favorites/planet/1", None, 0),
+    ("api.cache_stats", "GET", "/stats/cache", None, 0),
+]
+
+def add_favorites(client, auth):
+    client.post("/favorite/character/1", json={"name": "Character 1"}, headers=auth)
+    client.post("/favorite/planet/1", json={"name": "Planet 1"}, headers=auth)
+
+def run(client, method, url, body, headers):
+    with count_queries() as statements:
+        response = client.open(url, method=method, json=body, headers=headers)
+        response.get_data()
+        response.close()
+    return response, statements
+
+def test_every_route_has_a_pinned_budget(app):
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()
+                 if rule.endpoint == "sitemap" or rule.endpoint.split(".")[0] in (api.name, population.name)}
+    assert endpoints == set(BUDGETS)
+    for endpoint in endpoints:
+        assert app.view_functions[endpoint].query_budget == BUDGETS[endpoint], endpoint
+
+def test_every_route_has_a_scenario():
+    covered = {scenario[0] for scenario in SCENARIOS} | {"population.population_character", "population.handle_characters"}
+    assert covered == set(BUDGETS)
+
+@pytest.mark.parametrize("endpoint, method, url, body, streamed", SCENARIOS, ids=[f"{s[1]} {s[2]}" for s in SCENARIOS])
+def test_route_stays_within_budget(app, client, catalog, auth, endpoint, method, url, body, streamed):
+    add_favorites(client, auth)
+    # the catalog version and a cached entry, for the routes that use them
+    client.get("/characters/2")
+
+    response, statements = run(client, method, url, body, auth)
+    assert response.status_code < 500, response.get_data(as_text=True)
+    assert len(statements) <= BUDGETS[endpoint] + streamed, "\n".join(statements)
+
+@pytest.mark.parametrize("path", ["/population/characters", "/population/planets"])
+@pytest.mark.parametrize("mode", ["incremental", "full"])
+def test_population_stays_within_budget(app, client, path, mode):
+    stub = SwapiStub(people=25, planets=25).start()
+    try:
+        app.config["SWAPI_BASE_URL"] = stub.base_url
+        response, statements = run(client, "POST", f"{path}?mode={mode}", None, {})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert len(statements) <= 6, "\n".join(statements)
+    finally:
+        stub.stop()
+
+def test_over_budget_raises_in_tests_and_logs_otherwise(app, catalog, caplog):
+    @query_budget(1)
+    def two_queries():
+        db.session.query(Character).first()
+        db.session.query(Planet).first()
+        return "ok"
+
+    with app.test_request_context("/"):
+        with pytest.raises(QueryBudgetExceeded) as error:
+            two_queries()
+        assert len(error.value.statements) == 2
+        app.config["QUERY_BUDGET_MODE"] = "log"
+        assert two_queries() == "ok"
+    assert "two_queries ran 2 queries, budget is 1" in caplog.text
@@ -0,0 +1,58 @@
+import shutil
+
+from conftest import CHARACTER, make_app, seed_catalog
+from models import db, User
+
+def make_replicated_app(tmp_path):
+    """
+    An app with two replicas, copies of the primary taken after seeding: they
+    never see later writes, like replicas lagging behind.
+    """
+    primary = tmp_path / "primary.sqlite"
+    seed_catalog(make_app(primary), 3)
+    replicas = [tmp_path / f"replica{n}.sqlite" for n in range(2)]
+    for replica in replicas:
+        shutil.copyfile(primary, replica)
+    return make_app(primary, DB_REPLICA_URLS=[f"sqlite:///{replica}" for replica in replicas],
+                    DB_REPLICA_CHECK_INTERVAL=0)
+
+def test_writer_reads_its_own_write_after_a_replica_read(tmp_path):
+    app = make_replicated_app(tmp_path)
+    writer = app.test_client()
+    reader = app.test_client()
+
+    assert writer.post("/characters", json=CHARACTER).status_code == 200
+    # sticky: read from the primary, which caches the new catalog version
+    assert "Luke" in writer.get("/characters?limit=5").get_data(as_text=True)
+    # read from a lagging replica, under that replica's version
+    assert "Luke" not in reader.get("/characters?limit=7").get_data(as_text=True)
+
+    assert "Luke" in writer.get("/characters?limit=7").get_data(as_text=True)
+    assert "Luke" not in reader.get("/characters?limit=7").get_data(as_text=True)
+
+def login(app, client):
+    with app.app_context():
+        db.session.add(User(name="Luke", username="luke", password="secret", email="luke@example.com"))
+        db.session.commit()
+    token = client.post("/login", json={"username": "luke", "password": "secret"}).json["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def test_bearer_client_reads_its_own_favorites(tmp_path):
+    app = make_replicated_app(tmp_path)
+    # an API client: no cookie jar, so no sticky cookie
+    client = app.test_client(use_cookies=False)
+    auth = login(app, client)
+
+    assert client.post("/favorite/character/1", json={"name": "Character 1"}, headers=auth).status_code == 200
+    favorites = client.get("/users/favorites", headers=auth).json
+    assert [(favorite["nature"], favorite["nature_id"]) for favorite in favorites] == [("character", 1)]
+
+def test_logged_out_token_is_rejected_with_replicas(tmp_path):
+    app = make_replicated_app(tmp_path)
+    client = app.test_client(use_cookies=False)
+    auth = login(app, client)
+    assert client.get("/users/favorites", headers=auth).status_code == 200
+
+    assert client.post("/logout", headers=auth).status_code == 200
+    assert client.get("/users/favorites", headers=auth).status_code == 401
+    assert client.get("/users", headers=auth).status_code == 401
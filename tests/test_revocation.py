@@ -0,0 +1,30 @@
+import time
+from models import db, RevokedToken
+from revocation import TokenBlocklist, token_blocklist
+
+def test_deleted_then_registered_in_the_same_second(app, client, auth):
+    assert client.delete("/users", headers=auth).status_code == 200
+    client.post("/users", json={"name": "Leia", "username": "leia", "email": "leia@example.com", "password": "x"})
+    response = client.post("/login", json={"username": "leia", "password": "x"})
+    # SQLite hands the deleted id out again
+    assert response.json["user_id"] == 1
+    headers = {"Authorization": "Bearer " + response.json["token"]}
+
+    assert client.get("/users/favorites", headers=headers).status_code == 200
+    assert client.get("/users/favorites", headers=auth).status_code == 401
+
+def test_revoking_again_reaches_other_workers(app):
+    # another worker: its own bloom filter and cache, refreshed on every check
+    worker = TokenBlocklist(refresh_interval=0)
+    with app.app_context():
+        token_blocklist.revoke_user(7)
+        db.session.commit()
+        # more revocations than the refresh overlap re-reads
+        db.session.add_all(RevokedToken(key=f"jti:other-{n}") for n in range(TokenBlocklist.refresh_overlap + 50))
+        db.session.commit()
+        payload = {"jti": "token", "sub": 7, "iat": int(time.time()), "issued": time.time()}
+        assert not worker.is_revoked(payload)
+
+        token_blocklist.revoke_user(7)
+        db.session.commit()
+        assert worker.is_revoked(payload)
@@ -0,0 +1,35 @@
+import pytest
+from models import Character
+from schema import Invalid, to_int, to_float
+from conftest import CHARACTER
+
+@pytest.mark.parametrize("value", ["1e400", "-1e400", "inf", "nan", float("inf"), float("nan")])
+def test_non_finite_numbers_are_invalid(value):
+    with pytest.raises(Invalid):
+        to_int(value)
+    with pytest.raises(Invalid):
+        to_float(value)
+
+def test_int_too_large_for_a_float_is_invalid():
+    with pytest.raises(Invalid):
+        to_float(10 ** 400)
+
+def test_swapi_numbers_still_convert():
+    assert to_int("1,358") == 1358
+    assert to_int("78.2") == 78
+    assert to_float("1e3") == 1000.0
+    assert to_int("unknown") is None
+
+def test_overflowing_character_is_rejected(app, client):
+    response = client.post("/characters", json=dict(CHARACTER, height="1e400"))
+    assert response.status_code == 400
+    assert response.json["errors"] == [{"field": "height", "error": "invalid", "value": "1e400"}]
+
+def test_overflowing_record_is_skipped_in_a_batch(app):
+    records = [dict(CHARACTER, name="Luke"), dict(CHARACTER, name="Leia", mass="1e400")]
+    with app.app_context():
+        summary = Character.bulk_upsert(records)
+        assert summary["inserted"] == 1
+        assert summary["skipped"] == 1
+        assert summary["errors"][0]["errors"] == [{"field": "mass", "error": "invalid", "value": "1e400"}]
+        assert Character.coerce({"height": "1e400", "name": "Han"}) == {"name": "Han"}